@@ -1,18 +1,32 @@
-import requests
+import asyncio
+import httpx
 import random
-import time
 import os
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from dotenv import load_dotenv
 
+from apexbtbot import clients, ratelimit
+from apexbtbot.prices import ETH_USD, price_cache
+
 load_dotenv()
 
 ETH_TOKEN_ADDRESS = "0x4200000000000000000000000000000000000006"
+ETH_PRICE_FALLBACK = 3456.00
+ALCHEMY_BATCH_SIZE = int(os.getenv("ALCHEMY_BATCH_SIZE", 50))
+# tokens/by-address rejects requests with more addresses than this.
+ALCHEMY_PRICES_CHUNK_SIZE = int(os.getenv("ALCHEMY_PRICES_CHUNK_SIZE", 25))
+
+# Invalid request/method/params: retrying the same item will not help.
+NON_RETRYABLE_RPC_ERRORS = {-32600, -32601, -32602}
 
 class AlchemyAPIWrapper:
-    def __init__(self, api_url, max_retries=5, base_delay=1):
+    def __init__(self, api_url, max_retries=5, base_delay=1, max_delay=30, batch_size=ALCHEMY_BATCH_SIZE):
         self.api_url = api_url
+        self.batch_size = batch_size
         self.max_retries = max_retries
         self.base_delay = base_delay
+        self.max_delay = max_delay
         self.prices_url = os.getenv("PRICES_NODE_URL")
 
         self.headers = {
@@ -20,38 +34,57 @@ class AlchemyAPIWrapper:
             "content-type": "application/json",
         }
 
-    def _make_request_with_retry(self, payload, prices=False, endpoint=None):
-        
+    def _get_url(self, prices=False, endpoint=None):
         url = self.api_url
         if prices:
             url = self.prices_url
 
             if endpoint:
-                url += f'/{endpoint}' 
+                url += f'/{endpoint}'
+        return url
 
-        for attempt in range(self.max_retries):
+    def _backoff(self, attempt):
+        return min(self.base_delay * (2**attempt) + random.uniform(0, 1), self.max_delay)
+
+    def _retry_after(self, response):
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
             try:
-                response = requests.post(
-                    url, headers=self.headers, json=payload
-                )
+                delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                return None
+        return min(max(delay, 0), self.max_delay)
 
-                if response.status_code == 429:
-                    if "Retry-After" in response.headers:
-                        delay = int(response.headers["Retry-After"])
-                    else:
-                        delay = (self.base_delay * (2**attempt)) + (
-                            random.uniform(0, 1)
-                        )
+    def _throttle(self, limiter, response, attempt):
+        delay = self._retry_after(response)
+        if delay is None:
+            delay = self._backoff(attempt)
+        limiter.penalize(delay)
+
+    async def _make_request_async(self, payload, prices=False, endpoint=None, client=None):
+        url = self._get_url(prices, endpoint)
+        client = client or clients.http_client()
+        limiter = ratelimit.limiter("alchemy_prices" if prices else "alchemy")
 
-                    time.sleep(delay)
+        for attempt in range(self.max_retries):
+            try:
+                await limiter.acquire()
+                response = await client.post(url, headers=self.headers, json=payload)
+
+                if response.status_code in (429, 503):
+                    # The shared limiter makes the next acquire wait it out.
+                    self._throttle(limiter, response, attempt)
                     continue
 
                 elif response.status_code != 200:
                     print(
                         f"Request {payload} failed with status {response.status_code}. Retrying... (Attempt {attempt + 1}/{self.max_retries})"
                     )
-                    delay = (self.base_delay * (2**attempt)) + (random.uniform(0, 1))
-                    time.sleep(delay)
+                    await asyncio.sleep(self._backoff(attempt))
                     continue
 
                 data = response.json()
@@ -63,47 +96,130 @@ class AlchemyAPIWrapper:
                     print(
                         f"JSON-RPC error: {error_message}. Retrying... (Attempt {attempt + 1}/{self.max_retries})"
                     )
-                    delay = (self.base_delay * (2**attempt)) + (random.uniform(0, 1))
-                    time.sleep(delay)
+                    await asyncio.sleep(self._backoff(attempt))
                     continue
 
                 return data
 
-            except requests.exceptions.RequestException as e:
-                if attempt == self.max_retries - 1: 
+            except httpx.HTTPError as e:
+                if attempt == self.max_retries - 1:
                     print(f"All retry attempts failed. Final error: {e}")
                     return None
 
-                delay = (self.base_delay * (2**attempt)) + (random.uniform(0, 1))
+                delay = self._backoff(attempt)
                 print(
                     f"Request error: {e}. Retrying after {delay:.2f} seconds (Attempt {attempt + 1}/{self.max_retries})"
                 )
-                time.sleep(delay)
+                await asyncio.sleep(delay)
 
         return None
 
-    def get_token_balances(self, wallet_address, token_type="erc20"):
-        payload = {
+    async def _post_batch(self, client, batch, attempt):
+        # Returns (items by id, throttled).
+        limiter = ratelimit.limiter("alchemy")
+        await limiter.acquire()
+        try:
+            response = await client.post(self.api_url, headers=self.headers, json=batch)
+        except httpx.HTTPError as e:
+            print(f"Batch request error: {e}")
+            return {}, False
+
+        if response.status_code in (429, 503):
+            self._throttle(limiter, response, attempt)
+            return {}, True
+
+        if response.status_code != 200:
+            print(f"Batch request of {len(batch)} items failed with status {response.status_code}")
+            return {}, False
+
+        try:
+            data = response.json()
+        except ValueError as e:
+            # e.g. an HTML error page from a proxy; retried like any failed chunk.
+            print(f"Batch response was not JSON: {e}")
+            return {}, False
+
+        if not isinstance(data, list):
+            print(f"Batch request rejected: {data.get('error') if isinstance(data, dict) else data}")
+            return {}, False
+
+        return {item.get("id"): item for item in data if isinstance(item, dict)}, False
+
+    async def _make_batch_request_async(self, requests, client=None):
+        # requests is a list of {"method", "params"}; results come back in the
+        # same order, with None for items that failed or errored permanently.
+        client = client or clients.http_client()
+        results = [None] * len(requests)
+        pending = list(range(len(requests)))
+
+        for attempt in range(self.max_retries):
+            chunks = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+            responses = await asyncio.gather(*(
+                self._post_batch(
+                    client, [{"id": index, "jsonrpc": "2.0", **requests[index]} for index in chunk], attempt
+                )
+                for chunk in chunks
+            ))
+
+            pending = []
+            throttled = False
+            for chunk, (items, chunk_throttled) in zip(chunks, responses):
+                throttled = throttled or chunk_throttled
+                for index in chunk:
+                    item = items.get(index)
+                    if item is None:
+                        pending.append(index)
+                    elif "error" in item:
+                        error = item["error"]
+                        if not isinstance(error, dict) or error.get("code") not in NON_RETRYABLE_RPC_ERRORS:
+                            pending.append(index)
+                    else:
+                        results[index] = item.get("result")
+
+            if not pending or attempt == self.max_retries - 1:
+                break
+
+            print(f"Retrying {len(pending)} failed batch items (Attempt {attempt + 1}/{self.max_retries})")
+            if not throttled:
+                await asyncio.sleep(self._backoff(attempt))
+
+        if pending:
+            print(f"{len(pending)} batch items failed after all retry attempts")
+        return results
+
+    def _make_request_with_retry(self, payload, prices=False, endpoint=None):
+        # Blocking entry point for scripts; runs the async request on a private
+        # loop and client, so it must not be called from inside the bot's loop.
+        async def run():
+            async with clients.create_http_client() as client:
+                return await self._make_request_async(payload, prices, endpoint, client=client)
+
+        return asyncio.run(run())
+
+    @staticmethod
+    def _token_balances_payload(wallet_address, token_type, page_key=None):
+        params = [wallet_address, token_type]
+        if page_key:
+            params.append({"pageKey": page_key})
+        return {
             "id": 1,
             "jsonrpc": "2.0",
             "method": "alchemy_getTokenBalances",
-            "params": [wallet_address, token_type],
+            "params": params,
         }
 
-        return self._make_request_with_retry(payload)
-
-    def get_token_metadata(self, token_address):
-        payload = {
+    @staticmethod
+    def _token_metadata_payload(token_address):
+        return {
             "id": 1,
             "jsonrpc": "2.0",
             "method": "alchemy_getTokenMetadata",
             "params": [token_address],
         }
 
-        return self._make_request_with_retry(payload)
-
-    def get_token_price_in_usd(self, token_address):
-        payload = {
+    @staticmethod
+    def _token_price_payload(token_address):
+        return {
             "addresses": [
                 {
                     "network": "base-mainnet",
@@ -112,24 +228,119 @@ class AlchemyAPIWrapper:
             ]
         }
 
-        return self._make_request_with_retry(payload, prices=True, endpoint="tokens/by-address")
-
-    def get_token_balances_and_prices(self, wallet_address, currency="USD"):
-
-        payload = {
+    @staticmethod
+    def _token_balances_and_prices_payload(wallet_address, currency):
+        return {
             "id": 1,
             "jsonrpc": "2.0",
             "method": "alchemy_getTokenBalancesAndPrices",
             "params": [wallet_address, {"currency": currency}],
         }
 
-        return self._make_request_with_retry(payload)
-
-    def get_eth_price(self):
+    @staticmethod
+    def _parse_eth_price(response, default=ETH_PRICE_FALLBACK):
         try:
-            response = self.get_token_price_in_usd(ETH_TOKEN_ADDRESS)
-            price_in_usd = float(response.get("data", [])[0].get("prices", [])[0].get("value", 0.0))
-            return price_in_usd
-
+            return float(response.get("data", [])[0].get("prices", [])[0].get("value", 0.0))
         except:
-            return 3456.00
\ No newline at end of file
+            return default
+
+    async def _fetch_eth_price(self):
+        return self._parse_eth_price(await self.get_token_price_in_usd_async(ETH_TOKEN_ADDRESS), default=None)
+
+    async def get_token_balances_async(self, wallet_address, token_type="erc20"):
+        return await self._make_request_async(self._token_balances_payload(wallet_address, token_type))
+
+    async def iter_token_balance_pages(self, wallet_address, token_type="erc20"):
+        page_key = None
+        while True:
+            response = await self._make_request_async(
+                self._token_balances_payload(wallet_address, token_type, page_key)
+            )
+            if not response:
+                raise Exception(f"Failed to fetch token balances for {wallet_address}")
+
+            result = response.get("result", {})
+            yield result.get("tokenBalances", [])
+
+            page_key = result.get("pageKey")
+            if not page_key:
+                return
+
+    async def get_token_metadata_async(self, token_address):
+        return await self._make_request_async(self._token_metadata_payload(token_address))
+
+    async def get_token_metadata_batch_async(self, token_addresses):
+        results = await self._make_batch_request_async([
+            {"method": "alchemy_getTokenMetadata", "params": [token_address]}
+            for token_address in token_addresses
+        ])
+        return dict(zip(token_addresses, results))
+
+    async def get_token_price_in_usd_async(self, token_address):
+        return await self._make_request_async(
+            self._token_price_payload(token_address), prices=True, endpoint="tokens/by-address"
+        )
+
+    async def get_token_prices_async(self, addresses, strict=False):
+        # addresses: [{"network", "address"}]. Chunks are sent concurrently and
+        # each is retried on its own, so one failed chunk only loses its tokens
+        # (or fails the whole call when strict).
+        chunks = [
+            addresses[i:i + ALCHEMY_PRICES_CHUNK_SIZE]
+            for i in range(0, len(addresses), ALCHEMY_PRICES_CHUNK_SIZE)
+        ]
+        responses = await asyncio.gather(*(
+            self._make_request_async({"addresses": chunk}, prices=True, endpoint="tokens/by-address")
+            for chunk in chunks
+        ))
+
+        token_prices = []
+        for chunk, response in zip(chunks, responses):
+            if not response or "data" not in response:
+                if strict:
+                    raise Exception(f"Failed to fetch prices for {len(chunk)} tokens")
+                print(f"Failed to fetch prices for {len(chunk)} tokens")
+                continue
+            token_prices += response["data"]
+        return token_prices
+
+    async def get_token_balances_and_prices_async(self, wallet_address, currency="USD"):
+        return await self._make_request_async(
+            self._token_balances_and_prices_payload(wallet_address, currency)
+        )
+
+    async def get_eth_price_async(self, strict=False):
+        price = await price_cache.get(ETH_USD, self._fetch_eth_price)
+        if price is None and strict:
+            raise Exception("Failed to fetch ETH price")
+        return price if price is not None else ETH_PRICE_FALLBACK
+
+    def get_token_balances(self, wallet_address, token_type="erc20"):
+        return self._make_request_with_retry(self._token_balances_payload(wallet_address, token_type))
+
+    def get_token_metadata(self, token_address):
+        return self._make_request_with_retry(self._token_metadata_payload(token_address))
+
+    def get_token_metadata_batch(self, token_addresses):
+        async def run():
+            async with clients.create_http_client() as client:
+                results = await self._make_batch_request_async([
+                    {"method": "alchemy_getTokenMetadata", "params": [token_address]}
+                    for token_address in token_addresses
+                ], client=client)
+                return dict(zip(token_addresses, results))
+
+        return asyncio.run(run())
+
+    def get_token_price_in_usd(self, token_address):
+        return self._make_request_with_retry(
+            self._token_price_payload(token_address), prices=True, endpoint="tokens/by-address"
+        )
+
+    def get_token_balances_and_prices(self, wallet_address, currency="USD"):
+        return self._make_request_with_retry(
+            self._token_balances_and_prices_payload(wallet_address, currency)
+        )
+
+    def get_eth_price(self):
+        return self._parse_eth_price(self.get_token_price_in_usd(ETH_TOKEN_ADDRESS))
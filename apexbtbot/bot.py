@@ -12,27 +12,33 @@ from telegram.ext import (
 )
 from dotenv import load_dotenv
 from web3 import Web3, exceptions
-from solana.rpc.api import Client
 from decimal import Decimal
 from datetime import datetime
-from io import BytesIO
+from io import BytesIO, TextIOWrapper
 import os
+import csv
+import asyncio
 import time
+import tempfile
 import qrcode
-import base64
 
 
 from apexbtbot.database import Database
+from apexbtbot.transaction_logger import TransactionLogger
+from apexbtbot.wallet_pool import WalletPool
+from apexbtbot.persistence import PostgresPersistence
+from apexbtbot.token_metadata import token_metadata
 from apexbtbot.wallet import Wallet
-from apexbtbot import abi, web3utils, settings, util
-from apexbtbot.alchemy import AlchemyAPIWrapper
+from apexbtbot.signers import get_evm_signer, get_solana_signer
+from apexbtbot import abi, clients, ratelimit, web3utils, settings, util
 from apexbtbot.solana import util as solana_utils
 from apexbtbot.constants import SOL_DECIMAL
 from apexbtbot.solana.functions import _buy, _sell, BuyTokenParams, SellTokenParams
 from apexbtbot.solana.fetch import JupiterAggregator, get_amm_v4_pair_from_rpc
 
 db = Database()
-db.init()
+transaction_logger = TransactionLogger(db)
+wallet_pool = WalletPool(db)
 
 load_dotenv()
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -48,10 +54,13 @@ CHAIN_SELECTION = range(100, 101)
 
 SELL_AMOUNT_CHOICE = "SELL_AMOUNT_CHOICE"
 
-alchemy = AlchemyAPIWrapper(ETH_NODE_URL)
-radiyum = Client(SOL_NODE_URL)
+HISTORY_PAGE_SIZE = 10
+HISTORY_CURSOR_FORMAT = "%Y%m%d%H%M%S%f"
 
-w3 = Web3(Web3.HTTPProvider(ETH_NODE_URL))
+alchemy = clients.alchemy_api()
+radiyum = clients.solana_client()
+
+w3 = clients.base_web3()
 jupiter = JupiterAggregator()
 
 UNISWAP_ROUTER_ADDRESS = "0x2626664c2603336E57B271c5C0b26F421741e481"
@@ -76,12 +85,9 @@ main_keyboard = [
 ]
 
 
-def _get_keypair_from_user_id(user_id):
-    user_data = db.get_user_by_telegram_id(user_id)
-    wallet = db.get_wallet_by_user_id(user_data["id"])
-    decoded = base64.b64decode(Wallet.decrypt_private_key(wallet["solana_private_key"]))
-    keypair = Wallet.get_keypair_from_private_key(decoded)
-    return keypair
+async def _get_keypair_from_user_id(user_id):
+    user_data, wallet = await db.get_user_with_wallet(user_id)
+    return get_solana_signer(wallet["solana_private_key"]).keypair
 
 def buy_sol_chain(update, context):
 
@@ -109,6 +115,9 @@ def _get_dynamic_context(update: Update):
 
     return update.effective_user, update.message
 
+def _get_ledger_chain(selected_chain: str):
+    return "EVM" if selected_chain == "base_chain" else "Solana"
+
 def _get_dynamic_url(selected_chain: str, token_address=None, tx_hash=None):
     if selected_chain == "base_chain":
         url = f"https://basescan.org" 
@@ -144,6 +153,8 @@ async def prompt_chain(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 def register_chain_handlers(application):
     balance_chain_handler = ConversationHandler(
+        name="balance_chain",
+        persistent=True,
         entry_points=[
             CallbackQueryHandler(handle_callbacks, pattern="^check_balance$"),
             CommandHandler("positions", start_balance_chain_selection),
@@ -162,6 +173,8 @@ def register_chain_handlers(application):
     )
 
     buy_chain_handler = ConversationHandler(
+        name="buy_chain",
+        persistent=True,
         entry_points=[
             CallbackQueryHandler(handle_callbacks, pattern="^buy_start$"),
             CommandHandler("buy", start_buy_chain_selection),
@@ -195,6 +208,8 @@ def register_chain_handlers(application):
     )
 
     sell_chain_handler = ConversationHandler(
+        name="sell_chain",
+        persistent=True,
         entry_points=[
             CallbackQueryHandler(handle_callbacks, pattern="^sell_start$"),
             CommandHandler("sell", start_sell_chain_selection),
@@ -265,34 +280,69 @@ async def handle_chain_balance(update: Update, context: ContextTypes.DEFAULT_TYP
     await query.answer()
     selected_chain = query.data
     user, _ = _get_dynamic_context(update)
-    db_user = db.get_user_by_telegram_id(user.id)
-    wallet = db.get_wallet_by_user_id(db_user["id"])
+    user_data, wallet = await db.get_user_with_wallet(user.id)
 
     if not wallet:
         await no_wallet(update, context)
         return ConversationHandler.END
 
-    await query.message.edit_text("Fetching balance...")
+    chain = "base" if selected_chain == "base_chain" else "solana"
+    snapshot = (await db.get_positions_snapshots(user_data["id"])).get(chain)
 
-    try:
-        if selected_chain == "base_chain":
-            wallet_address = db.get_wallet_address_by_user_id(db_user["id"])
-            balance_message = Wallet.build_evm_balance_string(wallet_address)
-        else:
-            wallet_address = db.get_wallet_address_by_user_id(
-                db_user["id"], chain="solana"
-            )
-            balance_message = Wallet.build_solana_balance_string(wallet_address)
+    if snapshot:
+        await query.message.edit_text(
+            _render_snapshot(snapshot["balance_message"], snapshot["fetched_at"], refreshing=True),
+            parse_mode="HTML",
+        )
+    else:
+        await query.message.edit_text("Fetching balance...")
 
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        balance_message += f"\n\n<i>Last fetched at: {timestamp}</i>"
+    context.application.create_task(
+        _refresh_chain_balance(query.message, user_data["id"], chain, wallet, snapshot), update=update
+    )
 
-        await query.message.edit_text(balance_message, parse_mode="HTML")
+    return ConversationHandler.END
+
+async def _refresh_chain_balance(message, user_id, chain, wallet, snapshot=None):
+    try:
+        balance_message = await _fetch_balance_message(user_id, chain, wallet)
+        await _edit_if_changed(
+            message, _render_snapshot(balance_message, datetime.now()), parse_mode="HTML"
+        )
     except Exception as e:
-        await query.message.edit_text(f"Error fetching balance: {e}")
         print(f"Error fetching balance: {e}")
+        if snapshot:
+            # Keep showing the last good positions rather than replacing them.
+            await _edit_if_changed(
+                message,
+                _render_snapshot(snapshot["balance_message"], snapshot["fetched_at"], failed=True),
+                parse_mode="HTML",
+            )
+        else:
+            await _edit_if_changed(message, f"Error fetching balance: {e}")
 
-    return ConversationHandler.END
+async def _fetch_balance_message(user_id, chain, wallet):
+    # Strict, so a failed fetch raises instead of being saved as zero balances.
+    if chain == "base":
+        portfolio = await Wallet.build_evm_portfolio(wallet["evm_address"], strict=True)
+    else:
+        portfolio = await Wallet.build_solana_portfolio(wallet["solana_address"], strict=True)
+
+    balance_message = portfolio.render()
+    await db.save_positions_snapshot(user_id, chain, balance_message)
+    return balance_message
+
+def _render_snapshot(balance_message, fetched_at, refreshing=False, failed=False):
+    timestamp = fetched_at.strftime("%Y-%m-%d %H:%M:%S")
+    status = " (refreshing...)" if refreshing else " (refresh failed)" if failed else ""
+    return f"{balance_message}\n\n<i>Last fetched at: {timestamp}{status}</i>"
+
+async def _edit_if_changed(message, text, **kwargs):
+    try:
+        await message.edit_text(text, **kwargs)
+    except error.BadRequest as e:
+        if "not modified" not in str(e):
+            raise
 
 async def no_wallet(update, context):
     _, message = _get_dynamic_context(update)
@@ -340,8 +390,7 @@ async def handle_chain_deposit(update: Update, context: ContextTypes.DEFAULT_TYP
     await query.answer()
     selected_chain = query.data
     user = query.from_user
-    user_data = db.get_user_by_telegram_id(user.id)
-    wallet = db.get_wallet_by_user_id(user_data["id"])
+    user_data, wallet = await db.get_user_with_wallet(user.id)
 
     if not wallet:
         await no_wallet(update, context)
@@ -391,9 +440,6 @@ async def show_qr_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
 
-        user = query.from_user
-        user_data = db.get_user_by_telegram_id(user.id)
-
         wallet_address = context.user_data["wallet_address"]
 
         qr = qrcode.QRCode(version=1, box_size=10, border=5)
@@ -426,10 +472,9 @@ async def check_deposit_balance(update: Update, context: ContextTypes.DEFAULT_TY
         await query.answer()
 
         user = query.from_user
-        user_data = db.get_user_by_telegram_id(user.id)
-        wallet_address = db.get_wallet_address_by_user_id(user_data["id"])
+        _, wallet = await db.get_user_with_wallet(user.id)
 
-        balance_message = Wallet.build_evm_balance_string(wallet_address)
+        balance_message = await Wallet.build_evm_balance_string(wallet["evm_address"])
 
         keyboard = [
             [InlineKeyboardButton("🔄 Refresh Balance", callback_data="check_balance")]
@@ -460,8 +505,7 @@ async def withdraw_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
         message = update.message
     try:
-        user_data = db.get_user_by_telegram_id(user.id)
-        wallet = db.get_wallet_by_user_id(user_data["id"])
+        user_data, wallet = await db.get_user_with_wallet(user.id)
 
         private_key = Wallet.decrypt_private_key(wallet["evm_private_key"])
         if not private_key:
@@ -497,70 +541,54 @@ async def welcome_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await start(update, context)
 
 async def create_wallet_for_user(user_id):
-    evm_wallet = Wallet.create_evm_wallet()
-    solana_wallet = Wallet.create_solana_wallet()
-
-    db.add_wallet(
-        user_id=user_id,
-        evm_address=evm_wallet["address"],
-        evm_private_key=evm_wallet["encrypted_private_key"],
-        solana_address=solana_wallet["address"],
-        solana_private_key=solana_wallet["encrypted_private_key"],
-    )
+    return await wallet_pool.assign(user_id)
 
-    return evm_wallet, solana_wallet
+async def ensure_transaction_partitions(context: ContextTypes.DEFAULT_TYPE):
+    try:
+        await db.ensure_transaction_partitions()
+    except Exception as e:
+        print(f"Error creating transaction partitions: {e}")
+
+async def refill_wallet_pool(context: ContextTypes.DEFAULT_TYPE):
+    try:
+        await wallet_pool.refill()
+    except Exception as e:
+        print(f"Error refilling wallet pool: {e}")
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    user_data = db.get_user_by_telegram_id(user.id)
+    user_data, wallet = await db.get_user_with_wallet(user.id)
     reply_markup = InlineKeyboardMarkup(main_keyboard)
 
 
     if not user_data:
-        db.add_user(user.id, user.full_name)
-        user_data = db.get_user_by_telegram_id(user.id)
         await update.message.reply_text("New user detected, creating wallets and account...")
 
-    wallet = db.get_wallet_by_user_id(user_data["id"])
-
-    await update.message.reply_text("Please wait while I gather your information...")
-
     if wallet:
-        try:
-            evm_balance_string = Wallet.build_evm_balance_string(wallet["evm_address"])
-            sol_balance_string = Wallet.build_solana_balance_string(
-                wallet["solana_address"]
-            )
-            await update.message.reply_text(
-                f"<b>Welcome back to ApexBT Bot, {user.full_name}!</b>\n\n"
-                f"<u>Your Wallet Details:</u>\n"
-                f"🔑 <b>EVM Wallet:</b> <code>{wallet['evm_address']}</code> (Tap to copy)\n"
-                f"\n\n{evm_balance_string}\n\n"
-                f"🔑 <b>Solana Wallet:</b> <code>{wallet['solana_address']}</code> (Tap to copy)"
-                f"\n\n{sol_balance_string}\n\n"
-                f"",
-                reply_markup=reply_markup,
-                parse_mode="HTML",
-            )
-        except Exception as e:
-            await update.message.reply_text(
-                f"<b>Welcome back to ApexBT Bot, {user.full_name}!</b>\n\n"
-                f"<u>Your Wallet Details:</u>\n"
-                f"🔑 <b>EVM Wallet:</b> <code>{wallet['evm_address']}</code> (Tap to copy)\n"
-                f"🔑 <b>Solana Wallet:</b> <code>{wallet['solana_address']}</code> (Tap to copy)\n\n"
-                f"⚠️ Balance information temporarily unavailable",
-                reply_markup=reply_markup,
-                parse_mode="HTML",
-            )
+        # Reply from the last known positions straight away, then refresh.
+        snapshots = await db.get_positions_snapshots(user_data["id"])
+        welcome_message = await update.message.reply_text(
+            _welcome_back_message(user, wallet, snapshots.get("base"), snapshots.get("solana")),
+            reply_markup=reply_markup,
+            parse_mode="HTML",
+        )
+        context.application.create_task(
+            _refresh_welcome_message(welcome_message, user, user_data["id"], wallet, reply_markup),
+            update=update,
+        )
     else:
+        await update.message.reply_text("Please wait while I gather your information...")
         try:
-            evm_wallet, solana_wallet = await create_wallet_for_user(user_data["id"])
+            if user_data:
+                wallet = await create_wallet_for_user(user_data["id"])
+            else:
+                user_data, wallet = await wallet_pool.register(user.id, user.full_name)
 
             await update.message.reply_text(
                 f"<b>Welcome to ApexBT Bot, {user.full_name}!</b>\n\n"
                 f"<u>Your New Wallets Have Been Created:</u>\n"
-                f"🔑 <b>EVM Wallet:</b> <code>{evm_wallet['address']}</code> (Tap to copy)\n"
-                f"🔑 <b>Solana Wallet:</b> <code>{solana_wallet['address']}</code> (Tap to copy)\n\n"
+                f"🔑 <b>EVM Wallet:</b> <code>{wallet['evm_address']}</code> (Tap to copy)\n"
+                f"🔑 <b>Solana Wallet:</b> <code>{wallet['solana_address']}</code> (Tap to copy)\n\n"
                 f"✨ Your wallets are ready to use! You can now:\n"
                 f"• Deposit funds\n"
                 f"• Check balances\n"
@@ -574,6 +602,57 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 parse_mode="HTML",
             )
 
+def _welcome_back_message(user, wallet, evm_snapshot, sol_snapshot, refreshing=True, unavailable=False):
+    def balance_section(snapshot):
+        if not snapshot:
+            return "<i>Fetching balances...</i>" if refreshing else ""
+        return _render_snapshot(snapshot["balance_message"], snapshot["fetched_at"], refreshing)
+
+    message = (
+        f"<b>Welcome back to ApexBT Bot, {user.full_name}!</b>\n\n"
+        f"<u>Your Wallet Details:</u>\n"
+        f"🔑 <b>EVM Wallet:</b> <code>{wallet['evm_address']}</code> (Tap to copy)\n"
+        f"\n\n{balance_section(evm_snapshot)}\n\n"
+        f"🔑 <b>Solana Wallet:</b> <code>{wallet['solana_address']}</code> (Tap to copy)"
+        f"\n\n{balance_section(sol_snapshot)}\n\n"
+    )
+    if unavailable:
+        message += "⚠️ Balance information temporarily unavailable"
+    return message
+
+async def _refresh_welcome_message(message, user, user_id, wallet, reply_markup):
+    chains = ("base", "solana")
+    results = await asyncio.gather(
+        *(_fetch_balance_message(user_id, chain, wallet) for chain in chains),
+        return_exceptions=True,
+    )
+
+    fetched_at = datetime.now()
+    stored = None
+    snapshots = []
+    for chain, result in zip(chains, results):
+        if not isinstance(result, Exception):
+            snapshots.append({"balance_message": result, "fetched_at": fetched_at})
+            continue
+
+        # Fall back to the last known positions for a chain that failed.
+        print(f"Error refreshing {chain} balance: {result}")
+        if stored is None:
+            stored = await db.get_positions_snapshots(user_id)
+        snapshots.append(stored.get(chain))
+
+    unavailable = any(isinstance(result, Exception) for result in results)
+
+    try:
+        await _edit_if_changed(
+            message,
+            _welcome_back_message(user, wallet, *snapshots, refreshing=False, unavailable=unavailable),
+            reply_markup=reply_markup,
+            parse_mode="HTML",
+        )
+    except Exception as e:
+        print(f"Error updating welcome message: {e}")
+
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     reply_markup = InlineKeyboardMarkup(main_keyboard)
@@ -675,8 +754,7 @@ async def buy_token_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
     token_address = update.message.text.strip()
     selected_chain = context.user_data.get("selected_chain")
 
-    user_data = db.get_user_by_telegram_id(user.id)
-    wallet = db.get_wallet_by_user_id(user_data["id"])
+    user_data, wallet = await db.get_user_with_wallet(user.id)
 
     if selected_chain == "base_chain":
         name, symbol, decimals, price_in_eth, eth_balance, price_in_usd, keyboard = (
@@ -730,7 +808,7 @@ async def buy_token_address(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return BUY_AMOUNT_CHOICE
 
 async def _buy_token_address_sol(token_address, wallet, message):
-    name, symbol, decimals, price_in_sol, price_in_usd = solana_utils.get_token_info(
+    name, symbol, decimals, price_in_sol, price_in_usd = await solana_utils.get_token_info(
         token_address
     )
 
@@ -738,7 +816,7 @@ async def _buy_token_address_sol(token_address, wallet, message):
         await message.reply_text("Token not found, please try again.")
         return ConversationHandler.END
 
-    sol_balance = Wallet.get_solana_balance(wallet["solana_address"])
+    sol_balance = await asyncio.to_thread(Wallet.get_solana_balance, wallet["solana_address"])
 
     keyboard = [
         [
@@ -759,9 +837,9 @@ async def _buy_token_address_evm(token_address, wallet, message):
     )
 
     price_in_eth = 1 / price_in_eth
-    eth_balance = Wallet.get_evm_balance(wallet["evm_address"])
+    eth_balance = await asyncio.to_thread(Wallet.get_evm_balance, wallet["evm_address"])
 
-    eth_to_usd = web3utils.fetch_eth_to_usd()
+    eth_to_usd = await web3utils.fetch_eth_to_usd()
     if eth_to_usd is None:
         await message.reply_text(
             "Could not fetch the current ETH/USD price. Try again later."
@@ -822,8 +900,7 @@ async def buy_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
     value_in_usd = float(price_in_usd) * amount
 
     try:
-        user_data = db.get_user_by_telegram_id(user.id)
-        wallet = db.get_wallet_by_user_id(user_data["id"])
+        user_data, wallet = await db.get_user_with_wallet(user.id)
         if not wallet:
             await no_wallet(update, context)
             return ConversationHandler.END
@@ -834,10 +911,11 @@ async def buy_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
             else wallet["solana_address"]
         )
 
-        balance = (
-            Wallet.get_evm_balance(wallet_address)
+        balance = await asyncio.to_thread(
+            Wallet.get_evm_balance
             if selected_chain == "base_chain"
-            else Wallet.get_solana_balance(wallet_address)
+            else Wallet.get_solana_balance,
+            wallet_address,
         )
 
         token_amount = amount / float(price_in_native)
@@ -934,8 +1012,7 @@ async def buy_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
     amount_in_native = context.user_data["buy_amount_native"]
     amount_in_token = context.user_data["buy_amount_tokens"]
 
-    user_data = db.get_user_by_telegram_id(user.id)
-    wallet = db.get_wallet_by_user_id(user_data["id"])
+    user_data, wallet = await db.get_user_with_wallet(user.id)
 
     keyboard = [
         [
@@ -947,29 +1024,34 @@ async def buy_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     await message.reply_text("Sending transaction now...")
 
-    if selected_chain == "base_chain":
-        tx_hash = await _buy_confirm_evm(
-            token_address,
-            token_decimals,
-            token_symbol,
-            amount_in_native,
-            wallet,
-            message,
-            keyboard,
-        )
-        origin_domain = "basescan.org"
+    with ratelimit.priority():
+        if selected_chain == "base_chain":
+            tx_hash = await _buy_confirm_evm(
+                token_address,
+                token_decimals,
+                token_symbol,
+                amount_in_native,
+                wallet,
+                message,
+                keyboard,
+            )
+            origin_domain = "basescan.org"
 
-    else:
-        tx_hash = await _buy_confirm_sol(
-            token_address, wallet, message, amount_in_native
-        )
-        print("Exited")
-        origin_domain = "explorer.solana.com"
+        else:
+            tx_hash = await _buy_confirm_sol(
+                token_address, wallet, message, amount_in_native
+            )
+            print("Exited")
+            origin_domain = "explorer.solana.com"
 
     if not tx_hash:
         await message.reply_text("Router currently busy, please try again later.")
         return ConversationHandler.END
 
+    transaction_logger.log(
+        user_data["id"], "buy", _get_ledger_chain(selected_chain), token_address, amount_in_token
+    )
+
     url = f"https://{origin_domain}/tx/0x{tx_hash}"
     await message.reply_text(
         f"Buy transaction sent successfully!\n"
@@ -981,11 +1063,8 @@ async def buy_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 async def _buy_confirm_sol(token_address, wallet, message, amount_in_native):
-    print(wallet['solana_private_key'])
-    print(Wallet.decrypt_private_key(wallet["solana_private_key"]))
-    print(Wallet.decrypt_private_key("gAAAAABneZ3Hr7hSrzfcIS0cm1GNu_nw27THB28-QuMPGp4R_Y6oUBMZeggm53QpCiugqM9xEktLHNm1Qa383Rhi--_o-BhSEbO-dTnlV4apSbJ4KsAdGxGMIKmdby1BD8v_J3aLDqB97OzPhBkqSESBB74kAm_Cj-6tunO5_1Lr2mLOXqkHul_CQ5SE6ofw7ntRaV0zcF89"))
     buy_params = BuyTokenParams(
-        private_key=Wallet.decrypt_private_key(wallet["solana_private_key"]),
+        signer=get_solana_signer(wallet["solana_private_key"]),
         token_mint=token_address,  
         sol_amount=amount_in_native,
     )
@@ -1007,7 +1086,7 @@ async def _buy_confirm_evm(
 
     slippage = settings.default.base.gas_fee
 
-    evm_private_key = Wallet.decrypt_private_key(wallet["evm_private_key"])
+    account = get_evm_signer(wallet["evm_private_key"]).account
     sender_address = wallet["evm_address"]
 
     try:
@@ -1063,9 +1142,7 @@ async def _buy_confirm_evm(
             }
         )
 
-        signed_tx = w3.eth.account.sign_transaction(
-            transaction, private_key=evm_private_key
-        )
+        signed_tx = account.sign_transaction(transaction)
         tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
 
         return tx_hash.hex()
@@ -1075,9 +1152,7 @@ async def _buy_confirm_evm(
             try:
                 gas_price = int(current_gas_price * 1.5)
                 transaction["gasPrice"] = gas_price
-                signed_tx = w3.eth.account.sign_transaction(
-                    transaction, private_key=evm_private_key
-                )
+                signed_tx = account.sign_transaction(transaction)
                 tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
                 return tx_hash
             except Exception as retry_e:
@@ -1100,8 +1175,7 @@ async def sell_token_address(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await query.answer()
 
     user, message = _get_dynamic_context(update)
-    user_data = db.get_user_by_telegram_id(user.id)
-    wallet = db.get_wallet_by_user_id(user_data["id"])
+    user_data, wallet = await db.get_user_with_wallet(user.id)
     selected_chain = context.user_data.get("selected_chain")
     wallet_address = wallet['evm_address' if selected_chain == "base_chain" else 'solana_address']
 
@@ -1112,10 +1186,10 @@ async def sell_token_address(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
 
         if selected_chain == "base_chain":
-            token_balances = Wallet.get_evm_token_balances(wallet_address)
+            token_balances = await Wallet.get_evm_token_balances(wallet_address)
 
         else:
-            token_balances = Wallet.get_solana_token_balances(wallet_address)
+            token_balances = await Wallet.get_solana_token_balances(wallet_address)
 
         context.user_data["token_data"] = {}
         message_parts = ["Select a token to sell:\n"]
@@ -1151,12 +1225,12 @@ async def sell_token_address(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 )
 
         if selected_chain == "base_chain":
-            balance_string = Wallet.build_evm_balance_string(
+            balance_string = await Wallet.build_evm_balance_string(
                 wallet_address, no_title=True, no_eth=True
             )
 
         else:
-            balance_string = Wallet.build_solana_balance_string(
+            balance_string = await Wallet.build_solana_balance_string(
                 wallet_address, no_title=True, no_sol=True
             )
 
@@ -1264,10 +1338,10 @@ async def show_sell_confirmation(update: Update, context: ContextTypes.DEFAULT_T
     value_usd = price_in_usd * amount
 
     if selected_chain == "base_chain":
-        eth_price_usd = alchemy.get_eth_price()
+        eth_price_usd = await alchemy.get_eth_price_async()
         token_price_native = value_usd / eth_price_usd
     else:
-        sol_price_usd = solana_utils.get_sol_price()
+        sol_price_usd = await solana_utils.get_sol_price()
         token_price_native = value_usd / sol_price_usd
 
     
@@ -1322,7 +1396,7 @@ async def sell_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         context.user_data["sell_amount"] = amount
 
-        eth_price_usd = web3utils.fetch_eth_to_usd()
+        eth_price_usd = await web3utils.fetch_eth_to_usd()
         name, symbol, decimals, price_in_eth = await web3utils.get_token_info(
             address, w3
         )
@@ -1375,8 +1449,7 @@ async def sell_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
     
     user = query.from_user
-    user_data = db.get_user_by_telegram_id(user.id)
-    wallet = db.get_wallet_by_user_id(user_data["id"])
+    user_data, wallet = await db.get_user_with_wallet(user.id)
 
     token_address = context.user_data["sell_token_address"]
     amount_to_sell = context.user_data["sell_amount"]
@@ -1390,10 +1463,11 @@ async def sell_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
     status_message = await query.message.reply_text("Checking token approval and sending transaction...")
 
 
-    if selected_chain == "base_chain":
-        tx_hash = await _sell_confirm_eth(token_address, amount_to_sell, wallet)    
-    else:
-        tx_hash = await _sell_confirm_sol(token_address, amount_to_sell, wallet)
+    with ratelimit.priority():
+        if selected_chain == "base_chain":
+            tx_hash = await _sell_confirm_eth(token_address, amount_to_sell, wallet)    
+        else:
+            tx_hash = await _sell_confirm_sol(token_address, amount_to_sell, wallet)
     
     
    
@@ -1420,9 +1494,11 @@ async def sell_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=InlineKeyboardMarkup(keyboard_balance),
         )
         return ConversationHandler.END
-            
-    
-    
+
+    transaction_logger.log(
+        user_data["id"], "sell", _get_ledger_chain(selected_chain), token_address, amount_to_sell
+    )
+
     await status_message.edit_text(
         success_message,
         parse_mode="Markdown",
@@ -1435,7 +1511,7 @@ async def _sell_confirm_eth(token_address, amount_to_sell, wallet):
     token_address = Web3.to_checksum_address(token_address)
     slippage = settings.default.base.slippage
     sender_address = wallet["evm_address"]
-    evm_private_key = Wallet.decrypt_private_key(wallet["evm_private_key"])
+    account = get_evm_signer(wallet["evm_private_key"]).account
     
     router_address = Web3.to_checksum_address("0x2626664c2603336E57B271c5C0b26F421741e481")
     weth_address = Web3.to_checksum_address("0x4200000000000000000000000000000000000006")
@@ -1464,7 +1540,7 @@ async def _sell_confirm_eth(token_address, amount_to_sell, wallet):
             "nonce": w3.eth.get_transaction_count(sender_address),
         })
         
-        signed_approval = w3.eth.account.sign_transaction(approval_tx, private_key=evm_private_key)
+        signed_approval = account.sign_transaction(approval_tx)
         approval_hash = w3.eth.send_raw_transaction(signed_approval.raw_transaction)
         print("Approval tx sent: ", approval_hash)
         # Wait for approval to be mined
@@ -1511,14 +1587,14 @@ async def _sell_confirm_eth(token_address, amount_to_sell, wallet):
         "nonce": w3.eth.get_transaction_count(sender_address),
     })
     
-    signed_tx = w3.eth.account.sign_transaction(swap_tx, private_key=evm_private_key)
+    signed_tx = account.sign_transaction(swap_tx)
     tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
     return tx_hash.hex()
 
 async def _sell_confirm_sol(token_address, amount_to_sell, wallet):
-    _, _, decimals, _, _ = solana_utils.get_token_info(token_address)
+    _, _, decimals, _, _ = await solana_utils.get_token_info(token_address)
     sell_params = SellTokenParams(
-        private_key=Wallet.decrypt_private_key(wallet["solana_private_key"]),
+        signer=get_solana_signer(wallet["solana_private_key"]),
         token_mint=token_address,  
         token_amount=amount_to_sell,
         token_decimals=decimals
@@ -1564,7 +1640,7 @@ async def wallets_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         message = update.message
         user = update.effective_user
 
-    user_data = db.get_user_by_telegram_id(user.id)
+    user_data, wallet = await db.get_user_with_wallet(user.id)
 
     if not user_data:
         await message.reply_text(
@@ -1572,8 +1648,6 @@ async def wallets_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    wallet = db.get_wallet_by_user_id(user_data["id"])
-
     if not wallet:
         await message.reply_text("You don't have a wallet. Use /start to create one.")
         return
@@ -1589,13 +1663,126 @@ async def wallets_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+def _encode_history_cursor(cursor):
+    created_at, transaction_id = cursor
+    return f"history_page_{created_at.strftime(HISTORY_CURSOR_FORMAT)}_{transaction_id}"
+
+def _decode_history_cursor(data):
+    created_at, transaction_id = data.removeprefix("history_page_").split("_")
+    return datetime.strptime(created_at, HISTORY_CURSOR_FORMAT), int(transaction_id)
+
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user, message = _get_dynamic_context(update)
+
+    before = None
+    if update.callback_query:
+        await update.callback_query.answer()
+        before = _decode_history_cursor(update.callback_query.data)
+
+    user_data, _ = await db.get_user_with_wallet(user.id)
+    if not user_data:
+        await message.reply_text(
+            "You are not registered. Use /start to register and create your wallets."
+        )
+        return
+
+    transactions, next_cursor = await db.get_transactions_page(
+        user_data["id"], limit=HISTORY_PAGE_SIZE, before=before
+    )
+
+    if not transactions and not before:
+        await message.reply_text("You don't have any transactions yet.")
+        return
+
+    history_message = "<b>Transaction History</b>\n\n"
+    for transaction in transactions:
+        timestamp = transaction["created_at"].strftime("%Y-%m-%d %H:%M")
+        history_message += (
+            f"{timestamp} {transaction['transaction_type'].upper()} "
+            f"<code>{transaction['amount']}</code> on {transaction['chain']}\n"
+            f"<code>{transaction['token']}</code>\n\n"
+        )
+
+    keyboard = []
+    if next_cursor:
+        keyboard.append(
+            [InlineKeyboardButton("Older", callback_data=_encode_history_cursor(next_cursor))]
+        )
+    keyboard.append([InlineKeyboardButton("Export CSV", callback_data="history_export")])
+    reply_markup = InlineKeyboardMarkup(keyboard)
+
+    if update.callback_query:
+        await message.edit_text(history_message, parse_mode="HTML", reply_markup=reply_markup)
+    else:
+        await message.reply_text(history_message, parse_mode="HTML", reply_markup=reply_markup)
+
+async def export_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    user, message = _get_dynamic_context(update)
+    user_data, _ = await db.get_user_with_wallet(user.id)
+    if not user_data:
+        await message.reply_text("You are not registered. Use /start first.")
+        return
+
+    # Rows stream from a server-side cursor and spill to disk past 1MB.
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as export_file:
+        text_file = TextIOWrapper(export_file, encoding="utf-8", newline="")
+        writer = csv.writer(text_file)
+        writer.writerow(["created_at", "type", "chain", "token", "amount", "status"])
+        async for transaction in db.iter_transactions(user_data["id"]):
+            writer.writerow(
+                [
+                    transaction["created_at"].isoformat(),
+                    transaction["transaction_type"],
+                    transaction["chain"],
+                    transaction["token"],
+                    transaction["amount"],
+                    transaction["status"],
+                ]
+            )
+        text_file.flush()
+        export_file.seek(0)
+
+        await message.reply_document(
+            document=export_file, filename="apexbt_transactions.csv"
+        )
+        text_file.detach()
+
+
+async def post_init(application):
+    await db.connect()
+    token_metadata.db = db
+    transaction_logger.start()
+
+async def post_shutdown(application):
+    await transaction_logger.close()
+    await wallet_pool.close()
+    await db.close()
+    await clients.aclose()
+
 def main():
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .persistence(PostgresPersistence(db))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     register_chain_handlers(application)
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("wallet", wallets_command))
+    application.add_handler(CommandHandler("history", history_command))
+    application.add_handler(
+        CallbackQueryHandler(history_command, pattern="^history_page_")
+    )
+    application.add_handler(
+        CallbackQueryHandler(export_history, pattern="^history_export$")
+    )
     application.add_handler(
         CallbackQueryHandler(help_command, pattern="^help_command$")
     )
@@ -1606,6 +1793,9 @@ def main():
 
     register_deposit_handlers(application)
     register_withdraw_handlers(application)
+
+    application.job_queue.run_repeating(refill_wallet_pool, interval=60, first=0)
+    application.job_queue.run_repeating(ensure_transaction_partitions, interval=86400, first=0)
     print("ApexBT Bot is now running!")
     application.run_polling()
 
@@ -0,0 +1,91 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=60, on_evict=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        evicted = []
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                evicted.append(value)
+                self.misses += 1
+                value = default
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+        self._evict(evicted)
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        evicted = []
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None and previous[0] is not value:
+                evicted.append(previous[0])
+            self._data[key] = (value, expires_at)
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False)[1][0])
+        self._evict(evicted)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        self._evict([entry[0]])
+        return entry[0]
+
+    def pop_where(self, predicate):
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(value)]
+            evicted = [self._data.pop(key)[0] for key in keys]
+        self._evict(evicted)
+        return len(evicted)
+
+    def purge_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            keys = [key for key, (_, expires_at) in self._data.items() if expires_at <= now]
+            evicted = [self._data.pop(key)[0] for key in keys]
+        self._evict(evicted)
+        return len(evicted)
+
+    def clear(self):
+        with self._lock:
+            evicted = [value for value, _ in self._data.values()]
+            self._data.clear()
+        self._evict(evicted)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+    def _evict(self, values):
+        if self.on_evict:
+            for value in values:
+                self.on_evict(value)
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,142 @@
+import os
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from solana.rpc.api import Client
+from solana.rpc.providers import http as solana_http
+from dotenv import load_dotenv
+
+from apexbtbot import ratelimit
+
+load_dotenv()
+
+ETH_NODE_URL = os.getenv("ETH_NODE_URL")
+SOL_NODE_URL = os.getenv("SOL_NODE_URL")
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+# Connections kept per host by the requests sessions behind web3 and solana.
+RPC_POOL_MAXSIZE = int(os.getenv("RPC_POOL_MAXSIZE", 20))
+
+_lock = threading.Lock()
+_http_client = None
+_http_session = None
+_sessions = []
+_solana_client = None
+_base_web3 = None
+_alchemy = None
+
+
+def create_http_client():
+    return httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def http_client():
+    # One keep-alive client for the bot's event loop; scripts that run their
+    # own short-lived loops should use create_http_client() instead.
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+
+def create_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=RPC_POOL_MAXSIZE, pool_maxsize=RPC_POOL_MAXSIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    with _lock:
+        _sessions.append(session)
+    return session
+
+
+def http_session():
+    # Shared blocking session for the remaining sync REST calls.
+    global _http_session
+    if _http_session is None:
+        session = create_session()
+        with _lock:
+            if _http_session is None:
+                _http_session = session
+    return _http_session
+
+
+class SessionHTTPProvider(solana_http.HTTPProvider):
+    # solana-py posts every request with a bare requests.post; reuse one
+    # pooled session instead and count calls against the Solana RPC limit.
+    def __init__(self, endpoint, session, timeout=HTTP_TIMEOUT):
+        super().__init__(endpoint)
+        self.session = session
+        self.timeout = timeout
+
+    def make_request(self, method, *params):
+        ratelimit.limiter("solana_rpc").acquire_blocking()
+        request_kwargs = self._before_request(method=method, params=params, is_async=False)
+        raw_response = self.session.post(**request_kwargs, timeout=self.timeout)
+        return self._after_request(raw_response=raw_response, method=method)
+
+
+def solana_client():
+    global _solana_client
+    if _solana_client is None:
+        session = create_session()
+        with _lock:
+            if _solana_client is None:
+                client = Client(SOL_NODE_URL)
+                client._provider = SessionHTTPProvider(SOL_NODE_URL, session)
+                _solana_client = client
+    return _solana_client
+
+
+def base_web3():
+    global _base_web3
+    from web3 import Web3
+    from apexbtbot.rpc_pool import PooledHTTPProvider, base_rpc_pool
+
+    with _lock:
+        if _base_web3 is None:
+            _base_web3 = Web3(PooledHTTPProvider(base_rpc_pool))
+        return _base_web3
+
+
+def alchemy_api():
+    global _alchemy
+    from apexbtbot.alchemy import AlchemyAPIWrapper
+
+    with _lock:
+        if _alchemy is None:
+            _alchemy = AlchemyAPIWrapper(ETH_NODE_URL)
+        return _alchemy
+
+
+async def aclose():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+    global _http_session, _solana_client
+    with _lock:
+        sessions = list(_sessions)
+        _sessions.clear()
+        _http_session = None
+        _solana_client = None
+    for session in sessions:
+        session.close()
+
+    global _base_web3
+    with _lock:
+        web3, _base_web3 = _base_web3, None
+    if web3 is not None:
+        web3.provider.pool.close()
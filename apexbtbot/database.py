@@ -1,115 +1,615 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from psycopg2 import sql
 import os
+import asyncio
 from dotenv import load_dotenv
-from apexbtbot.queries import tables
+from psycopg import OperationalError
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from apexbtbot.queries import migrations
+from apexbtbot.cache import TTLCache
 
 load_dotenv()
 
 
+USER_WALLET_COLUMNS = ("wallet_id", "evm_address", "evm_private_key", "solana_address", "solana_private_key", "wallet_created_at")
+
+PSYCOPG_NEVER_PREPARE = 2**31 - 1
+
+REPLICA_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END AS lag;
+"""
+
+
 class Database:
-    def __init__(self):
+    USER_CACHE_SIZE = 10_000
+    USER_CACHE_TTL = 300
+    REPLICA_CHECK_INTERVAL = 5
+
+    def __init__(self, min_size=None, max_size=None, timeout=None, prepare_threshold=None, replica_url=None, max_replica_lag=None):
         self.DATABASE_URL = os.getenv("DATABASE_URL")
-        self._connection = None
+        self.REPLICA_URL = replica_url or os.getenv("DATABASE_REPLICA_URL")
+        self.min_size = min_size or int(os.getenv("DATABASE_POOL_MIN_SIZE", 2))
+        self.max_size = max_size or int(os.getenv("DATABASE_POOL_MAX_SIZE", 10))
+        self.timeout = timeout or float(os.getenv("DATABASE_POOL_TIMEOUT", 5))
+        self.max_replica_lag = max_replica_lag or float(os.getenv("DATABASE_REPLICA_MAX_LAG", 5))
+        # Executions of a statement before it is prepared; 0 disables preparing
+        # (needed behind a transaction-mode pgbouncer).
+        if prepare_threshold is None:
+            prepare_threshold = int(os.getenv("DATABASE_PREPARE_THRESHOLD", 2))
+        self.prepare_threshold = prepare_threshold
+        self._statements = {}
+        self._prepared_executions = {}
+        self._pool = None
+        self._replica_pool = None
+        self._replica_healthy = False
+        self._replica_task = None
+        self._user_cache = TTLCache(maxsize=self.USER_CACHE_SIZE, ttl=self.USER_CACHE_TTL)
+
+    def _create_pool(self, url):
+        return AsyncConnectionPool(
+            url,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            timeout=self.timeout,
+            # Preparing is decided per statement in execute(): a threshold psycopg
+            # never reaches stops it auto-preparing, while prepare=True still
+            # works (None would make psycopg ignore prepare=True as well).
+            kwargs={
+                "row_factory": dict_row,
+                "prepare_threshold": PSYCOPG_NEVER_PREPARE if self.prepare_threshold else None,
+            },
+            open=False,
+        )
+
+    async def connect(self):
+        if not self._pool:
+            pool = self._create_pool(self.DATABASE_URL)
+            await pool.open()
+            self._pool = pool
+            if self.REPLICA_URL and not self._replica_task:
+                self._replica_pool = self._create_pool(self.REPLICA_URL)
+                await self._replica_pool.open(wait=False)
+                self._replica_task = asyncio.create_task(self._check_replica())
+        return self._pool
+
+    async def connect_replica(self):
+        # Returns the replica pool, or None when there is no replica or it is
+        # down or lagging; callers then fall back to the primary.
+        await self.connect()
+        return self._replica_pool if self._replica_healthy else None
+
+    async def _check_replica(self):
+        # Probes lag in the background so reads never wait on the check.
+        while True:
+            try:
+                async with self._replica_pool.connection() as conn:
+                    cursor = await conn.execute(REPLICA_LAG_QUERY)
+                    lag = (await cursor.fetchone())["lag"]
+                healthy = lag <= self.max_replica_lag
+                if self._replica_healthy and not healthy:
+                    print(f"Read replica is {lag:.1f}s behind, reading from primary")
+                self._replica_healthy = healthy
+            except Exception as e:
+                if self._replica_healthy:
+                    print(f"Read replica unavailable, reading from primary: {e}")
+                self._replica_healthy = False
+            await asyncio.sleep(self.REPLICA_CHECK_INTERVAL)
+
+    async def close(self):
+        if self._replica_task:
+            self._replica_task.cancel()
+            try:
+                await self._replica_task
+            except asyncio.CancelledError:
+                pass
+            self._replica_task = None
+            self._replica_healthy = False
+        if self._pool:
+            await self._pool.close()
+            self._pool = None
+        if self._replica_pool:
+            await self._replica_pool.close()
+            self._replica_pool = None
+
+    async def execute(self, query, params=None, fetch_one=False, fetch_all=False, readonly=False):
+        executions = self._statements.get(query, 0) + 1
+        self._statements[query] = executions
+        prepare = bool(self.prepare_threshold) and executions >= self.prepare_threshold
+
+        if readonly:
+            replica = await self.connect_replica()
+            if replica:
+                try:
+                    return await self._execute_on(replica, query, params, fetch_one, fetch_all, prepare)
+                except (OperationalError, PoolTimeout) as e:
+                    print(f"Read replica query failed, retrying on primary: {e}")
+                    self._replica_healthy = False
+
+        pool = await self.connect()
+        return await self._execute_on(pool, query, params, fetch_one, fetch_all, prepare)
+
+    async def _stream(self, query, params, name, chunk_size):
+        # Yields rows chunk_size at a time from a named (server side) cursor,
+        # on the replica when it is healthy. Like execute(), a replica that
+        # fails before the first chunk falls back to the primary; once rows
+        # have been yielded an error is raised, since restarting would repeat them.
+        replica = await self.connect_replica()
+        if replica:
+            started = False
+            try:
+                async for rows in self._stream_on(replica, query, params, name, chunk_size):
+                    started = True
+                    yield rows
+                return
+            except (OperationalError, PoolTimeout) as e:
+                if started:
+                    raise
+                print(f"Read replica query failed, retrying on primary: {e}")
+                self._replica_healthy = False
+
+        pool = await self.connect()
+        async for rows in self._stream_on(pool, query, params, name, chunk_size):
+            yield rows
+
+    async def _stream_on(self, pool, query, params, name, chunk_size):
+        async with pool.connection() as conn:
+            async with conn.cursor(name=name) as cursor:
+                await cursor.execute(query, params)
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+
+    async def _execute_on(self, pool, query, params, fetch_one, fetch_all, prepare):
+        # The pooled connection context commits on success and rolls back on error.
+        async with pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                # psycopg prepares the statement once per connection and reuses it.
+                await cursor.execute(query, params, prepare=prepare)
+                if prepare:
+                    self._prepared_executions[query] = self._prepared_executions.get(query, 0) + 1
+                if fetch_one:
+                    return await cursor.fetchone()
+                elif fetch_all:
+                    return await cursor.fetchall()
+                return None
+
+    def prepared_statements(self):
+        statements = [
+            {
+                "query": " ".join(query.split()),
+                "executions": executions,
+                "prepared_executions": self._prepared_executions.get(query, 0),
+            }
+            for query, executions in self._statements.items()
+        ]
+        return sorted(statements, key=lambda statement: statement["executions"], reverse=True)
 
-    def connect(self):
-        if not self._connection:
-            self._connection = psycopg2.connect(
-                self.DATABASE_URL, cursor_factory=RealDictCursor
+    async def server_prepared_statements(self):
+        # What Postgres holds prepared on one pooled connection (statements are
+        # per connection), to check that execute() really prepares.
+        pool = await self.connect()
+        async with pool.connection() as conn:
+            cursor = await conn.execute(
+                "SELECT name, statement, prepare_time FROM pg_prepared_statements;"
             )
-        return self._connection
-
-    def close(self):
-        if self._connection:
-            self._connection.close()
-            self._connection = None
-
-    def execute(self, query, params=None, fetch_one=False, fetch_all=False):
-        conn = self.connect()
-        cursor = conn.cursor()
-        try:
-            cursor.execute(query, params)
-            if fetch_one:
-                result = cursor.fetchone()
-            elif fetch_all:
-                result = cursor.fetchall()
-            else:
-                result = None
-            conn.commit()
-            return result
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            cursor.close()
-
-    def init(self):
-        # self.rm_all()
-        for query in tables:
-            self.execute(query)
-        
-    def rm_all(self):
+            return await cursor.fetchall()
+
+    async def schema_version(self):
+        query = """
+        SELECT COALESCE(MAX(version), 0) AS version
+        FROM schema_migrations;
+        """
+        return (await self.execute(query, fetch_one=True))["version"]
+
+    async def migrate(self):
+        pool = await self.connect()
+        applied = []
+        async with pool.connection() as conn:
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    description TEXT,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                """
+            )
+            # Serialize concurrent deploys; the lock is released at commit.
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'));")
+            cursor = await conn.execute("SELECT version FROM schema_migrations;")
+            done = {row["version"] for row in await cursor.fetchall()}
+
+            for version, description, statements in migrations:
+                if version in done:
+                    continue
+                async with conn.transaction():
+                    for statement in statements:
+                        await conn.execute(statement)
+                    await conn.execute(
+                        "INSERT INTO schema_migrations (version, description) VALUES (%s, %s);",
+                        (version, description),
+                    )
+                applied.append(version)
+        return applied
+
+    async def rm_all(self):
         tables = ["transactions", "wallets", "users"]
-        conn = self.connect()
-        cursor = conn.cursor()
-        for table in tables:
-            query = f"DELETE FROM {table};"
-            cursor.execute(query)
-        conn.commit()
-        
-    def add_user(self, telegram_id, name):
+        pool = await self.connect()
+        async with pool.connection() as conn:
+            for table in tables:
+                query = f"DELETE FROM {table};"
+                await conn.execute(query)
+
+    async def add_user(self, telegram_id, name):
         query = """
         INSERT INTO users (telegram_id, name)
         VALUES (%s, %s)
         ON CONFLICT (telegram_id) DO NOTHING
         RETURNING id;
         """
-        return self.execute(query, (telegram_id, name), fetch_one=True)
+        result = await self.execute(query, (telegram_id, name), fetch_one=True)
+        self._user_cache.pop(telegram_id)
+        return result
 
-    def get_user_by_telegram_id(self, telegram_id):
+    async def get_user_by_telegram_id(self, telegram_id):
         query = "SELECT * FROM users WHERE telegram_id = %s;"
-        return self.execute(query, (telegram_id,), fetch_one=True)
+        return await self.execute(query, (telegram_id,), fetch_one=True, readonly=True)
 
-    def add_wallet(self, user_id, evm_address, evm_private_key, solana_address, solana_private_key):
+    async def add_wallet(self, user_id, evm_address, evm_private_key, solana_address, solana_private_key):
         query = """
         INSERT INTO wallets (user_id, evm_address, evm_private_key, solana_address, solana_private_key)
         VALUES (%s, %s, %s, %s, %s);
         """
-        self.execute(query, (user_id, evm_address, evm_private_key, solana_address, solana_private_key))
+        await self.execute(query, (user_id, evm_address, evm_private_key, solana_address, solana_private_key))
+        self._user_cache.pop_where(lambda entry: entry[0]["id"] == user_id)
+
+    async def count_pooled_wallets(self):
+        query = "SELECT COUNT(*) AS count FROM wallet_pool;"
+        return (await self.execute(query, fetch_one=True))["count"]
+
+    async def add_pooled_wallets(self, wallets, target_size=None):
+        # With target_size, only tops the pool up to that size. The advisory
+        # lock is held until commit, so concurrent refills from other
+        # processes count and insert one after the other.
+        pool = await self.connect()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                if target_size is not None:
+                    await cursor.execute("SELECT pg_advisory_xact_lock(hashtext('wallet_pool'));")
+                    await cursor.execute("SELECT COUNT(*) AS count FROM wallet_pool;")
+                    wallets = wallets[:max(target_size - (await cursor.fetchone())["count"], 0)]
+                    if not wallets:
+                        return 0
+                async with cursor.copy(
+                    "COPY wallet_pool (evm_address, evm_private_key, solana_address, solana_private_key) FROM STDIN"
+                ) as copy:
+                    for wallet in wallets:
+                        await copy.write_row(
+                            (
+                                wallet["evm_address"],
+                                wallet["evm_private_key"],
+                                wallet["solana_address"],
+                                wallet["solana_private_key"],
+                            )
+                        )
+        return len(wallets)
+
+    async def claim_pooled_wallet(self, user_id):
+        # Moves one pre-generated wallet to the user in a single statement;
+        # SKIP LOCKED lets concurrent /start calls claim different rows.
+        query = """
+        WITH claimed AS (
+            DELETE FROM wallet_pool
+            WHERE id = (
+                SELECT id FROM wallet_pool
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING evm_address, evm_private_key, solana_address, solana_private_key
+        )
+        INSERT INTO wallets (user_id, evm_address, evm_private_key, solana_address, solana_private_key)
+        SELECT %s, evm_address, evm_private_key, solana_address, solana_private_key
+        FROM claimed
+        RETURNING *;
+        """
+        wallet = await self.execute(query, (user_id,), fetch_one=True)
+        if wallet:
+            self._user_cache.pop_where(lambda entry: entry[0]["id"] == user_id)
+        return wallet
 
-    def get_wallet_by_user_id(self, user_id):
+    async def get_wallet_by_user_id(self, user_id):
         query = "SELECT * FROM wallets WHERE user_id = %s;"
-        return self.execute(query, (user_id,), fetch_one=True)
+        return await self.execute(query, (user_id,), fetch_one=True, readonly=True)
+
+    async def get_user_with_wallet(self, telegram_id, primary=False):
+        # primary=True skips the cache and replica, for reads right after a write.
+        # Users without a wallet are about to get one, so they are never cached.
+        if not primary:
+            cached = self._user_cache.get(telegram_id)
+            if cached is not None:
+                return cached
+
+        query = """
+        SELECT users.*,
+            wallets.id AS wallet_id,
+            wallets.evm_address,
+            wallets.evm_private_key,
+            wallets.solana_address,
+            wallets.solana_private_key,
+            wallets.created_at AS wallet_created_at
+        FROM users
+        LEFT JOIN wallets ON wallets.user_id = users.id
+        WHERE users.telegram_id = %s
+        LIMIT 1;
+        """
+        row = await self.execute(query, (telegram_id,), fetch_one=True, readonly=not primary)
+        return self._cache_user_row(telegram_id, row)
+
+    async def add_user_with_pooled_wallet(self, telegram_id, name):
+        # Creates the user and moves a pre-generated wallet to them in one
+        # statement. Returns (None, None) if the user already existed, and
+        # (user, None) if the pool was empty.
+        query = """
+        WITH new_user AS (
+            INSERT INTO users (telegram_id, name)
+            VALUES (%s, %s)
+            ON CONFLICT (telegram_id) DO NOTHING
+            RETURNING *
+        ),
+        claimed AS (
+            DELETE FROM wallet_pool
+            WHERE id = (
+                SELECT id FROM wallet_pool
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            AND EXISTS (SELECT 1 FROM new_user)
+            RETURNING evm_address, evm_private_key, solana_address, solana_private_key
+        ),
+        wallet AS (
+            INSERT INTO wallets (user_id, evm_address, evm_private_key, solana_address, solana_private_key)
+            SELECT new_user.id, claimed.evm_address, claimed.evm_private_key,
+                claimed.solana_address, claimed.solana_private_key
+            FROM new_user, claimed
+            RETURNING *
+        )
+        SELECT new_user.*,
+            wallet.id AS wallet_id,
+            wallet.evm_address,
+            wallet.evm_private_key,
+            wallet.solana_address,
+            wallet.solana_private_key,
+            wallet.created_at AS wallet_created_at
+        FROM new_user
+        LEFT JOIN wallet ON true;
+        """
+        row = await self.execute(query, (telegram_id, name), fetch_one=True)
+        self._user_cache.pop(telegram_id)
+        return self._cache_user_row(telegram_id, row)
+
+    def _cache_user_row(self, telegram_id, row):
+        if not row:
+            return None, None
+
+        user = {key: value for key, value in row.items() if key not in USER_WALLET_COLUMNS}
+        wallet = None
+        if row["wallet_id"] is not None:
+            wallet = {
+                "id": row["wallet_id"],
+                "user_id": user["id"],
+                "evm_address": row["evm_address"],
+                "evm_private_key": row["evm_private_key"],
+                "solana_address": row["solana_address"],
+                "solana_private_key": row["solana_private_key"],
+                "created_at": row["wallet_created_at"],
+            }
+
+        if wallet is not None:
+            self._user_cache.set(telegram_id, (user, wallet))
+        return user, wallet
+
+    def cache_stats(self):
+        return self._user_cache.stats()
 
-    def log_transaction(self, user_id, transaction_type, chain, token, amount):
+    async def log_transaction(self, user_id, transaction_type, chain, token, amount):
         query = """
         INSERT INTO transactions (user_id, transaction_type, chain, token, amount)
         VALUES (%s, %s, %s, %s, %s);
         """
-        self.execute(query, (user_id, transaction_type, chain, token, amount))
+        await self.execute(query, (user_id, transaction_type, chain, token, amount))
 
-    def get_transactions_by_user_id(self, user_id):
+    async def log_transactions(self, records):
+        # records are (user_id, transaction_type, chain, token, amount, created_at)
+        pool = await self.connect()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                async with cursor.copy(
+                    "COPY transactions (user_id, transaction_type, chain, token, amount, created_at) FROM STDIN"
+                ) as copy:
+                    for record in records:
+                        await copy.write_row(record)
+
+    async def get_transactions_by_user_id(self, user_id):
         query = "SELECT * FROM transactions WHERE user_id = %s ORDER BY created_at DESC;"
-        return self.execute(query, (user_id,), fetch_all=True)
+        return await self.execute(query, (user_id,), fetch_all=True, readonly=True)
+
+    async def get_transactions_page(self, user_id, limit=10, before=None):
+        # before is the (created_at, id) cursor returned with the previous page.
+        if before:
+            # The plain created_at bound lets the planner prune newer partitions;
+            # the row comparison alone does not.
+            query = """
+            SELECT * FROM transactions
+            WHERE user_id = %s AND created_at <= %s AND (created_at, id) < (%s, %s)
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s;
+            """
+            params = (user_id, before[0], before[0], before[1], limit + 1)
+        else:
+            query = """
+            SELECT * FROM transactions
+            WHERE user_id = %s
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s;
+            """
+            params = (user_id, limit + 1)
+
+        rows = await self.execute(query, params, fetch_all=True, readonly=True)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1]["created_at"], rows[-1]["id"])
+        return rows, next_cursor
 
-    def get_all_active_users(self):
+    async def iter_transactions(self, user_id, chunk_size=1000):
         query = """
-        SELECT users.* 
-        FROM users 
-        INNER JOIN wallets ON users.id = wallets.user_id 
+        SELECT * FROM transactions
+        WHERE user_id = %s
+        ORDER BY created_at DESC, id DESC;
+        """
+        async for rows in self._stream(query, (user_id,), f"transactions_export_{user_id}", chunk_size):
+            for row in rows:
+                yield row
+
+    async def get_all_active_users(self):
+        query = """
+        SELECT users.*
+        FROM users
+        INNER JOIN wallets ON users.id = wallets.user_id
         WHERE wallets.evm_address IS NOT NULL;
         """
-        return self.execute(query, fetch_all=True)
-    
-    def get_wallet_address_by_user_id(self, user_id, chain="base"):
+        return await self.execute(query, fetch_all=True, readonly=True)
+
+    async def save_positions_snapshot(self, user_id, chain, balance_message):
+        query = """
+        INSERT INTO positions_snapshot (user_id, chain, balance_message, fetched_at)
+        VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id, chain) DO UPDATE
+        SET balance_message = EXCLUDED.balance_message, fetched_at = EXCLUDED.fetched_at;
+        """
+        await self.execute(query, (user_id, chain, balance_message))
+
+    async def get_positions_snapshots(self, user_id):
+        query = "SELECT * FROM positions_snapshot WHERE user_id = %s;"
+        rows = await self.execute(query, (user_id,), fetch_all=True, readonly=True)
+        return {row["chain"]: row for row in rows}
+
+    async def get_token_metadata(self, chain, addresses, negative_ttl):
+        query = """
+        SELECT address, name, symbol, decimals, found FROM token_metadata
+        WHERE chain = %s AND address = ANY(%s)
+        AND (found OR updated_at > CURRENT_TIMESTAMP - %s * interval '1 second');
+        """
+        return await self.execute(query, (chain, list(addresses), negative_ttl), fetch_all=True, readonly=True)
+
+    async def save_token_metadata(self, chain, rows):
+        # rows: [(address, name, symbol, decimals, found)]
+        pool = await self.connect()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(
+                    """
+                    INSERT INTO token_metadata (chain, address, name, symbol, decimals, found, updated_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                    ON CONFLICT (chain, address) DO UPDATE
+                    SET name = EXCLUDED.name, symbol = EXCLUDED.symbol, decimals = EXCLUDED.decimals,
+                        found = EXCLUDED.found, updated_at = EXCLUDED.updated_at;
+                    """,
+                    [(chain, *row) for row in rows],
+                )
+
+    async def load_bot_user_data(self):
+        query = "SELECT user_id, data FROM bot_user_data;"
+        return await self.execute(query, fetch_all=True)
+
+    async def load_bot_conversations(self, name):
+        query = "SELECT key, state FROM bot_conversations WHERE name = %s;"
+        return await self.execute(query, (name,), fetch_all=True)
+
+    async def save_bot_state(self, user_data, dropped_users, conversations, ended_conversations):
+        # user_data: [(user_id, data)], conversations: [(name, key, state)],
+        # ended_conversations: [(name, key)]; all written in one transaction.
+        pool = await self.connect()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                if user_data:
+                    await cursor.executemany(
+                        """
+                        INSERT INTO bot_user_data (user_id, data, updated_at)
+                        VALUES (%s, %s, CURRENT_TIMESTAMP)
+                        ON CONFLICT (user_id) DO UPDATE
+                        SET data = EXCLUDED.data, updated_at = EXCLUDED.updated_at;
+                        """,
+                        user_data,
+                    )
+                if dropped_users:
+                    await cursor.execute(
+                        "DELETE FROM bot_user_data WHERE user_id = ANY(%s);",
+                        (list(dropped_users),),
+                    )
+                if conversations:
+                    await cursor.executemany(
+                        """
+                        INSERT INTO bot_conversations (name, key, state, updated_at)
+                        VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+                        ON CONFLICT (name, key) DO UPDATE
+                        SET state = EXCLUDED.state, updated_at = EXCLUDED.updated_at;
+                        """,
+                        conversations,
+                    )
+                if ended_conversations:
+                    await cursor.executemany(
+                        "DELETE FROM bot_conversations WHERE name = %s AND key = %s;",
+                        ended_conversations,
+                    )
+
+    async def ensure_transaction_partitions(self, months_ahead=3):
+        query = """
+        SELECT create_transactions_partition(
+            (date_trunc('month', now()) + make_interval(months => month_offset))::date
+        ) AS name
+        FROM generate_series(0, %s) AS month_offset;
+        """
+        return [row["name"] for row in await self.execute(query, (months_ahead,), fetch_all=True)]
+
+    async def get_transaction_partitions(self):
+        query = """
+        SELECT child.relname AS name
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'transactions'
+            AND child.relname ~ '^transactions_[0-9]{4}_[0-9]{2}$'
+        ORDER BY child.relname;
+        """
+        return [row["name"] for row in await self.execute(query, fetch_all=True)]
+
+    async def iter_active_users(self, chunk_size=500):
+        query = """
+        SELECT users.id, users.telegram_id, wallets.evm_address, wallets.solana_address
+        FROM users
+        INNER JOIN wallets ON users.id = wallets.user_id
+        WHERE wallets.evm_address IS NOT NULL
+        ORDER BY users.id;
+        """
+        async for rows in self._stream(query, None, "active_users_export", chunk_size):
+            yield rows
+
+    async def get_wallet_address_by_user_id(self, user_id, chain="base"):
         query = """
         SELECT evm_address, solana_address
-        FROM wallets 
+        FROM wallets
         WHERE user_id = %s;
         """
 
         key = "evm_address"
         if chain != "base":
             key = "solana_address"
-        return self.execute(query, (user_id,), fetch_one=True)[key]
\ No newline at end of file
+        return (await self.execute(query, (user_id,), fetch_one=True, readonly=True))[key]
\ No newline at end of file
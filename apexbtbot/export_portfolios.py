@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import csv
+
+from apexbtbot import clients
+from apexbtbot.database import Database
+from apexbtbot.token_metadata import token_metadata
+from apexbtbot.wallet import Wallet
+
+FIELDS = [
+    "user_id",
+    "telegram_id",
+    "chain",
+    "wallet_address",
+    "token_address",
+    "symbol",
+    "balance",
+    "price_in_usd",
+    "value_in_usd",
+]
+
+_DONE = object()
+
+
+def _portfolio_rows(user, portfolio):
+    base = {
+        "user_id": user["id"],
+        "telegram_id": user["telegram_id"],
+        "chain": portfolio.chain,
+        "wallet_address": portfolio.address,
+    }
+    rows = [
+        {
+            **base,
+            "token_address": "native",
+            "symbol": portfolio.native_symbol,
+            "balance": portfolio.native_balance,
+            "price_in_usd": portfolio.native_price,
+            "value_in_usd": portfolio.native_value_in_usd,
+        }
+    ]
+    for position in portfolio.positions:
+        rows.append(
+            {
+                **base,
+                "token_address": position.address,
+                "symbol": position.symbol,
+                "balance": position.balance,
+                "price_in_usd": position.price_in_usd,
+                "value_in_usd": position.value_in_usd,
+            }
+        )
+    return rows
+
+
+async def fetch_user_rows(user):
+    rows = []
+    if user["evm_address"]:
+        rows += _portfolio_rows(user, await Wallet.build_evm_portfolio(user["evm_address"]))
+    if user["solana_address"]:
+        rows += _portfolio_rows(user, await Wallet.build_solana_portfolio(user["solana_address"]))
+    return rows
+
+
+async def export(out_path, concurrency, chunk_size):
+    db = Database()
+    token_metadata.db = db
+
+    # Bounded queues keep at most a couple of chunks of users in memory.
+    users = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def produce():
+        # Workers must always be told to stop, or a failed read hangs the export.
+        try:
+            async for chunk in db.iter_active_users(chunk_size=chunk_size):
+                for user in chunk:
+                    await users.put(user)
+        finally:
+            for _ in range(concurrency):
+                await users.put(_DONE)
+
+    async def work():
+        while (user := await users.get()) is not _DONE:
+            try:
+                await results.put(await fetch_user_rows(user))
+            except Exception as e:
+                print(f"Error exporting portfolio for user {user['id']}: {e}")
+        await results.put(_DONE)
+
+    exported = 0
+    with open(out_path, "w", newline="") as out_file:
+        writer = csv.DictWriter(out_file, fieldnames=FIELDS)
+        writer.writeheader()
+
+        producer = asyncio.create_task(produce())
+        tasks = [producer] + [asyncio.create_task(work()) for _ in range(concurrency)]
+
+        try:
+            finished = 0
+            while finished < concurrency:
+                rows = await results.get()
+                if rows is _DONE:
+                    finished += 1
+                    continue
+                writer.writerows(rows)
+                exported += 1
+                if exported % chunk_size == 0:
+                    out_file.flush()
+                    print(f"Exported {exported} users")
+            # Re-raises a failure from reading the users.
+            await producer
+        finally:
+            for task in tasks:
+                task.cancel()
+            await db.close()
+            await clients.aclose()
+
+    print(f"Exported {exported} users to {out_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export every active user's holdings to CSV.")
+    parser.add_argument("--out", default="portfolios.csv")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    asyncio.run(export(args.out, args.concurrency, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import asyncio
+
+from apexbtbot.database import Database
+
+
+async def main():
+    db = Database()
+    try:
+        applied = await db.migrate()
+        version = await db.schema_version()
+    finally:
+        await db.close()
+
+    if applied:
+        print(f"Applied migrations: {', '.join(str(v) for v in applied)}")
+    print(f"Schema is at version {version}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+import os
+import json
+import pickle
+import asyncio
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+
+# The application hands over changed user_data and conversation states every
+# update_interval seconds; they are buffered here and written together in one
+# transaction shortly afterwards, so Postgres sees one batch per interval.
+class PostgresPersistence(BasePersistence):
+    def __init__(self, db, update_interval=None, flush_delay=0.1):
+        super().__init__(
+            store_data=PersistenceInput(
+                bot_data=False, chat_data=False, user_data=True, callback_data=False
+            ),
+            update_interval=update_interval or float(os.getenv("PERSISTENCE_UPDATE_INTERVAL", 5)),
+        )
+        self.db = db
+        self.flush_delay = flush_delay
+        self._user_data = {}
+        self._dropped_users = set()
+        self._conversations = {}
+        self._flush_task = None
+
+    async def get_user_data(self):
+        rows = await self.db.load_bot_user_data()
+        return {row["user_id"]: pickle.loads(row["data"]) for row in rows}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        rows = await self.db.load_bot_conversations(name)
+        return {tuple(json.loads(row["key"])): pickle.loads(row["state"]) for row in rows}
+
+    async def update_user_data(self, user_id, data):
+        self._dropped_users.discard(user_id)
+        self._user_data[user_id] = pickle.dumps(data)
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id):
+        self._user_data.pop(user_id, None)
+        self._dropped_users.add(user_id)
+        self._schedule_flush()
+
+    async def update_conversation(self, name, key, new_state):
+        # A state of None means the conversation ended.
+        state = None if new_state is None else pickle.dumps(new_state)
+        self._conversations[(name, json.dumps(list(key)))] = state
+        self._schedule_flush()
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def refresh_user_data(self, user_id, user_data):
+        # PTB hands changed user_data over only every update_interval, so the
+        # in-memory dict can be ahead of both this buffer and Postgres; reloading
+        # here would roll handlers back. Instances rely on sticky routing instead.
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        # A write cancelled mid-query puts its batch back before it exits, so
+        # wait for that and then write everything in one go.
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await self._write()
+
+    def _schedule_flush(self):
+        if not self._flush_task or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        delay = self.flush_delay
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self._write()
+                return
+            except Exception as e:
+                print(f"Error persisting bot state, will retry: {e}")
+                delay = self.update_interval
+
+    async def _write(self):
+        if not (self._user_data or self._dropped_users or self._conversations):
+            return
+
+        user_data, self._user_data = self._user_data, {}
+        dropped_users, self._dropped_users = self._dropped_users, set()
+        conversations, self._conversations = self._conversations, {}
+
+        try:
+            await self.db.save_bot_state(
+                list(user_data.items()),
+                dropped_users,
+                [(name, key, state) for (name, key), state in conversations.items() if state is not None],
+                [(name, key) for (name, key), state in conversations.items() if state is None],
+            )
+        except BaseException:
+            # Put the batch back unless newer writes for the same keys arrived.
+            for user_id, data in user_data.items():
+                if user_id not in self._dropped_users:
+                    self._user_data.setdefault(user_id, data)
+            for user_id in dropped_users:
+                if user_id not in self._user_data:
+                    self._dropped_users.add(user_id)
+            for key, state in conversations.items():
+                self._conversations.setdefault(key, state)
+            raise
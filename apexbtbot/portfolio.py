@@ -0,0 +1,70 @@
+from dataclasses import dataclass, field
+
+TITLES = {"base": "EVM", "solana": "Solana"}
+NATIVE_SYMBOLS = {"base": ("ETH",), "solana": ("WSOL", "SOL")}
+
+
+@dataclass
+class Position:
+    address: str
+    symbol: str
+    name: str
+    balance: float
+    price_in_usd: float
+    value_in_usd: float
+
+
+@dataclass
+class Portfolio:
+    chain: str
+    address: str
+    native_symbol: str
+    native_balance: float
+    native_price: float
+    positions: list[Position] = field(default_factory=list)
+
+    @classmethod
+    def from_token_balances(cls, chain, address, native_symbol, native_balance, native_price, token_balances):
+        positions = [
+            Position(
+                address=token_address,
+                symbol=data["symbol"],
+                name=data["name"],
+                balance=data["balance"],
+                price_in_usd=data["price_in_usd"],
+                value_in_usd=data["value_in_usd"],
+            )
+            for token_address, data in token_balances.items()
+        ]
+        return cls(chain, address, native_symbol, native_balance, native_price or 0, positions)
+
+    @property
+    def native_value_in_usd(self):
+        return self.native_balance * self.native_price
+
+    def token_positions(self, no_native=False):
+        if not no_native:
+            return self.positions
+        return [position for position in self.positions if position.symbol not in NATIVE_SYMBOLS[self.chain]]
+
+    def total_value_in_usd(self, no_native=False):
+        return self.native_value_in_usd + sum(position.value_in_usd for position in self.token_positions(no_native))
+
+    def render(self, no_title=False, no_native=False):
+        balance_compiled_message = (
+            f"{self.native_symbol}: <code>{self.native_balance:.4f} (${self.native_value_in_usd:.2f})</code>\n"
+        )
+
+        for position in self.token_positions(no_native):
+            if position.balance > 0.0:
+                balance_compiled_message += f"{position.symbol}: <code>{position.balance:.4f} (${position.value_in_usd:.2f})</code>\n"
+
+        balance_message = ""
+
+        if not no_title:
+            balance_message = f"<b>{TITLES[self.chain]} Wallet Positions:</b>\n\n"
+            balance_message += f"Total Portfolio Value: <code>${self.total_value_in_usd(no_native):.2f}</code>\n\n"
+            balance_message += "<b>Your Positions:</b>\n"
+
+        balance_message += balance_compiled_message
+        return balance_message
@@ -0,0 +1,83 @@
+import os
+import time
+import asyncio
+
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", 15))
+PRICE_CACHE_STALE_TTL = float(os.getenv("PRICE_CACHE_STALE_TTL", 120))
+# Token prices feed trade quotes, so they are kept briefly and never served stale.
+TOKEN_PRICE_CACHE_TTL = float(os.getenv("TOKEN_PRICE_CACHE_TTL", 5))
+
+ETH_USD = ("base", "ETH")
+SOL_USD = ("solana", "SOL")
+
+
+class PriceCache:
+    # Prices younger than ttl are served as is. Until stale_ttl they are still
+    # served, but a background refresh is started. Concurrent callers for the
+    # same key share one in-flight fetch.
+    def __init__(self, ttl=PRICE_CACHE_TTL, stale_ttl=PRICE_CACHE_STALE_TTL):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.misses = 0
+        self._prices = {}
+        self._inflight = {}
+
+    async def get(self, key, fetch):
+        entry = self._prices.get(key)
+        if entry is not None:
+            price, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return price
+            if age < self.stale_ttl:
+                self.hits += 1
+                self._refresh(key, fetch)
+                return price
+
+        self.misses += 1
+        return await asyncio.shield(self._refresh(key, fetch))
+
+    def peek(self, key):
+        entry = self._prices.get(key)
+        return entry[0] if entry is not None else None
+
+    def _refresh(self, key, fetch):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, fetch))
+            self._inflight[key] = task
+        return task
+
+    async def _fetch(self, key, fetch):
+        try:
+            price = await fetch()
+        except Exception as e:
+            print(f"Error fetching price for {key}: {e}")
+            price = None
+        finally:
+            self._inflight.pop(key, None)
+
+        if price is None:
+            # Keep serving the last known price rather than nothing, but only
+            # within the stale window.
+            entry = self._prices.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.stale_ttl:
+                return entry[0]
+            return None
+
+        self._prices[key] = (price, time.monotonic())
+        return price
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._prices),
+            "inflight": len(self._inflight),
+        }
+
+
+price_cache = PriceCache()
+token_price_cache = PriceCache(ttl=TOKEN_PRICE_CACHE_TTL, stale_ttl=TOKEN_PRICE_CACHE_TTL)
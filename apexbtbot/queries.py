@@ -30,4 +30,162 @@ tables = [
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
     """
-]
\ No newline at end of file
+]
+
+# Each migration is (version, description, statements) and is applied once,
+# in order, by Database.migrate. Never edit a migration that has shipped;
+# append a new one instead.
+migrations = [
+    (1, "create base tables", tables),
+    (
+        2,
+        "index hot lookup paths",
+        [
+            "CREATE INDEX IF NOT EXISTS wallets_user_id_idx ON wallets (user_id);",
+            """
+            CREATE INDEX IF NOT EXISTS transactions_user_id_created_at_idx
+            ON transactions (user_id, created_at DESC);
+            """,
+        ],
+    ),
+    (
+        3,
+        "keyset index for transaction history",
+        [
+            """
+            CREATE INDEX IF NOT EXISTS transactions_user_id_created_at_id_idx
+            ON transactions (user_id, created_at DESC, id DESC);
+            """,
+            "DROP INDEX IF EXISTS transactions_user_id_created_at_idx;",
+        ],
+    ),
+    (
+        4,
+        "pre-generated wallet pool",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS wallet_pool (
+                id SERIAL PRIMARY KEY,
+                evm_address TEXT NOT NULL,
+                evm_private_key TEXT NOT NULL,
+                solana_address TEXT NOT NULL,
+                solana_private_key TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """,
+        ],
+    ),
+    (
+        5,
+        "last known positions per chain",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS positions_snapshot (
+                user_id INT REFERENCES users(id) ON DELETE CASCADE,
+                chain TEXT NOT NULL, -- 'base' or 'solana'
+                balance_message TEXT NOT NULL,
+                fetched_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, chain)
+            );
+            """,
+        ],
+    ),
+    (
+        6,
+        "telegram bot persistence",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS bot_user_data (
+                user_id BIGINT PRIMARY KEY, -- telegram id
+                data BYTEA NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS bot_conversations (
+                name TEXT NOT NULL,
+                key TEXT NOT NULL,
+                state BYTEA NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (name, key)
+            );
+            """,
+        ],
+    ),
+    (
+        7,
+        "partition transactions by month",
+        [
+            "ALTER TABLE transactions RENAME TO transactions_legacy;",
+            "ALTER TABLE transactions_legacy RENAME CONSTRAINT transactions_pkey TO transactions_legacy_pkey;",
+            "ALTER INDEX transactions_user_id_created_at_id_idx RENAME TO transactions_legacy_user_id_created_at_id_idx;",
+            """
+            CREATE TABLE transactions (
+                id INT NOT NULL DEFAULT nextval('transactions_id_seq'),
+                user_id INT REFERENCES users(id) ON DELETE CASCADE,
+                transaction_type TEXT, -- 'buy' or 'sell'
+                chain TEXT, -- 'EVM' or 'Solana'
+                token TEXT,
+                amount DECIMAL(18, 8),
+                status TEXT DEFAULT 'pending',
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at);
+            """,
+            "ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id;",
+            """
+            CREATE INDEX transactions_user_id_created_at_id_idx
+            ON transactions (user_id, created_at DESC, id DESC);
+            """,
+            # Catches rows outside the pre-created months; should stay empty.
+            "CREATE TABLE transactions_default PARTITION OF transactions DEFAULT;",
+            """
+            CREATE OR REPLACE FUNCTION create_transactions_partition(partition_month DATE)
+            RETURNS TEXT AS $$
+            DECLARE
+                start_date DATE := date_trunc('month', partition_month);
+                partition_name TEXT := 'transactions_' || to_char(start_date, 'YYYY_MM');
+            BEGIN
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, start_date, (start_date + interval '1 month')::date
+                );
+                RETURN partition_name;
+            END;
+            $$ LANGUAGE plpgsql;
+            """,
+            """
+            SELECT create_transactions_partition(partition_month::date)
+            FROM generate_series(
+                date_trunc('month', COALESCE((SELECT MIN(created_at) FROM transactions_legacy), now())),
+                date_trunc('month', now()) + interval '3 months',
+                interval '1 month'
+            ) AS partition_month;
+            """,
+            """
+            INSERT INTO transactions (id, user_id, transaction_type, chain, token, amount, status, created_at)
+            SELECT id, user_id, transaction_type, chain, token, amount, status, COALESCE(created_at, CURRENT_TIMESTAMP)
+            FROM transactions_legacy;
+            """,
+            "DROP TABLE transactions_legacy;",
+        ],
+    ),
+    (
+        8,
+        "token metadata store",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS token_metadata (
+                chain TEXT NOT NULL, -- 'base' or 'solana'
+                address TEXT NOT NULL, -- lowercased on base
+                name TEXT,
+                symbol TEXT,
+                decimals INT,
+                found BOOLEAN NOT NULL DEFAULT TRUE, -- false caches an unknown token
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (chain, address)
+            );
+            """,
+        ],
+    ),
+]
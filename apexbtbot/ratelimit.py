@@ -0,0 +1,88 @@
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+
+RATE_LIMIT_RESERVE = float(os.getenv("RATE_LIMIT_RESERVE", 0.2))
+
+# name: (requests per second, burst); override with RATE_LIMIT_<NAME>=rate[/burst]
+DEFAULT_RATE_LIMITS = {
+    "alchemy": (25, 50),
+    "alchemy_prices": (5, 10),
+    "raydium": (10, 20),
+    "jupiter": (10, 20),
+    "coingecko": (0.5, 5),
+    "solana_rpc": (40, 80),
+}
+
+_priority = contextvars.ContextVar("rate_limit_priority", default=False)
+
+
+@contextmanager
+def priority():
+    # Trade-critical calls made inside this block may use the reserved share
+    # of every bucket. The flag follows awaits and asyncio.to_thread.
+    token = _priority.set(True)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None, reserve=RATE_LIMIT_RESERVE):
+        self.rate = rate
+        self.capacity = burst or rate
+        # Regular calls leave this many tokens in the bucket for priority ones.
+        self.reserved = self.capacity * reserve
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, priority):
+        # Returns 0 if a token was taken, otherwise how long to wait.
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            floor = 0 if priority else self.reserved
+            if self._tokens - 1 >= floor:
+                self._tokens -= 1
+                return 0
+            return (floor + 1 - self._tokens) / self.rate
+
+    async def acquire(self, priority=None):
+        priority = _priority.get() if priority is None else priority
+        while (delay := self._take(priority)) > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_blocking(self, priority=None):
+        priority = _priority.get() if priority is None else priority
+        while (delay := self._take(priority)) > 0:
+            time.sleep(delay)
+
+    def penalize(self, delay):
+        # Called on a 429: drain the bucket so every caller in the process
+        # waits out the provider's backoff instead of retrying on its own.
+        with self._lock:
+            self._tokens = min(self._tokens, 0) - delay * self.rate
+
+
+def _parse_limit(value, default):
+    if not value:
+        return default
+    rate, _, burst = value.partition("/")
+    return float(rate), float(burst) if burst else None
+
+
+limiters = {
+    name: TokenBucket(*_parse_limit(os.getenv(f"RATE_LIMIT_{name.upper()}"), default))
+    for name, default in DEFAULT_RATE_LIMITS.items()
+}
+
+
+def limiter(name):
+    return limiters[name]
@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import gzip
+import os
+from datetime import date
+
+from psycopg import sql
+
+from apexbtbot.database import Database
+
+
+def _partition_month(name):
+    year, month = name.removeprefix("transactions_").split("_")
+    return date(int(year), int(month), 1)
+
+
+def _months_before(day, months):
+    index = day.year * 12 + day.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+async def archive_partition(db, name, archive_dir):
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    partial_path = f"{path}.partial"
+    table = sql.Identifier(name)
+
+    pool = await db.connect()
+    async with pool.connection() as conn:
+        # Export first and only drop once the archive is safely on disk: the
+        # gzip trailer is written on close, so sync the raw file after that,
+        # then the directory so the rename itself survives a crash.
+        with open(partial_path, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+                async with conn.cursor() as cursor:
+                    async with cursor.copy(
+                        sql.SQL("COPY {} TO STDOUT (FORMAT csv, HEADER)").format(table)
+                    ) as copy:
+                        async for data in copy:
+                            archive.write(data)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(partial_path, path)
+        _fsync_dir(archive_dir)
+
+        await conn.execute(sql.SQL("ALTER TABLE transactions DETACH PARTITION {}").format(table))
+        await conn.execute(sql.SQL("DROP TABLE {}").format(table))
+
+    return path
+
+
+async def run(keep_months, months_ahead, archive_dir):
+    db = Database()
+    try:
+        created = await db.ensure_transaction_partitions(months_ahead)
+        print(f"Partitions ready through {created[-1]}")
+
+        cutoff = _months_before(date.today().replace(day=1), keep_months)
+        os.makedirs(archive_dir, exist_ok=True)
+        for name in await db.get_transaction_partitions():
+            if _partition_month(name) < cutoff:
+                path = await archive_partition(db, name, archive_dir)
+                print(f"Archived {name} to {path}")
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create upcoming transaction partitions and archive expired ones."
+    )
+    parser.add_argument("--keep-months", type=int, default=int(os.getenv("TRANSACTIONS_RETENTION_MONTHS", 12)))
+    parser.add_argument("--months-ahead", type=int, default=3)
+    parser.add_argument("--archive-dir", default=os.getenv("TRANSACTIONS_ARCHIVE_DIR", "archive"))
+    args = parser.parse_args()
+
+    asyncio.run(run(args.keep_months, args.months_ahead, args.archive_dir))
+
+
+if __name__ == "__main__":
+    main()
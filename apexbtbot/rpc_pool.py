@@ -0,0 +1,180 @@
+import os
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+from web3 import Web3
+from web3.providers.base import JSONBaseProvider
+
+from apexbtbot import clients
+
+load_dotenv()
+
+ETH_NODE_URLS = [
+    url.strip()
+    for url in os.getenv("ETH_NODE_URLS", os.getenv("ETH_NODE_URL") or "").split(",")
+    if url.strip()
+]
+ETH_RPC_TIMEOUT = float(os.getenv("ETH_RPC_TIMEOUT", 10))
+# Seconds to wait on the fastest node before also asking the next one; 0 disables hedging.
+ETH_RPC_HEDGE_AFTER = float(os.getenv("ETH_RPC_HEDGE_AFTER", 0))
+ETH_RPC_FAILURE_THRESHOLD = int(os.getenv("ETH_RPC_FAILURE_THRESHOLD", 3))
+ETH_RPC_COOLDOWN = float(os.getenv("ETH_RPC_COOLDOWN", 30))
+
+# Never hedged: sending the same write twice only produces errors.
+WRITE_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction"}
+
+
+class Endpoint:
+    ALPHA = 0.2
+
+    def __init__(self, url):
+        self.url = url
+        self.provider = Web3.HTTPProvider(
+            url,
+            request_kwargs={"timeout": ETH_RPC_TIMEOUT},
+            session=clients.create_session(),
+            exception_retry_configuration=None,
+        )
+        self.latency = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial = False
+
+    def record(self, latency, ok):
+        sample = 0.0 if ok else 1.0
+        self.error_rate += self.ALPHA * (sample - self.error_rate)
+        if ok:
+            self.latency = latency if self.latency is None else self.latency + self.ALPHA * (latency - self.latency)
+            self.failures = 0
+            self.open_until = 0.0
+        else:
+            self.failures += 1
+
+    def score(self):
+        # Unmeasured nodes sort first so they get probed.
+        return (self.latency or 0.0) * (1 + 4 * self.error_rate)
+
+
+class RpcPool:
+    # Routes each request to the healthy node with the best rolling latency.
+    # A node that fails failure_threshold times in a row is taken out for
+    # cooldown seconds, then gets a single trial request (half-open).
+    def __init__(self, urls, hedge_after=ETH_RPC_HEDGE_AFTER, failure_threshold=ETH_RPC_FAILURE_THRESHOLD, cooldown=ETH_RPC_COOLDOWN):
+        # An empty pool is allowed so importing never needs EVM configuration;
+        # it fails on the first request instead.
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.hedge_after = hedge_after
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(4, 2 * len(urls)), thread_name_prefix="rpc-hedge")
+
+    def ranked(self):
+        now = time.monotonic()
+        closed, trial = [], None
+        with self._lock:
+            for endpoint in self.endpoints:
+                if endpoint.failures < self.failure_threshold:
+                    closed.append(endpoint)
+                elif trial is None and endpoint.open_until <= now and not endpoint.trial:
+                    endpoint.trial = True
+                    trial = endpoint
+        # At most one recovering node per request, and it goes first so it is
+        # always the one called (and _record clears its trial flag); if it
+        # fails again the request falls through to the healthy ones.
+        ranked = ([trial] if trial else []) + sorted(closed, key=Endpoint.score)
+        # With every circuit open, still try the one that reopens soonest.
+        return ranked or [min(self.endpoints, key=lambda endpoint: endpoint.open_until)]
+
+    def _record(self, endpoint, started, ok):
+        with self._lock:
+            endpoint.record(time.monotonic() - started, ok)
+            endpoint.trial = False
+            if not ok and endpoint.failures >= self.failure_threshold:
+                endpoint.open_until = time.monotonic() + self.cooldown
+                print(f"RPC circuit opened for {endpoint.url} after {endpoint.failures} failures")
+
+    def _call(self, endpoint, method, params):
+        started = time.monotonic()
+        try:
+            response = endpoint.provider.make_request(method, params)
+        except Exception:
+            self._record(endpoint, started, False)
+            raise
+        self._record(endpoint, started, True)
+        return response
+
+    def request(self, method, params):
+        if not self.endpoints:
+            raise ValueError("No EVM RPC endpoints configured; set ETH_NODE_URL or ETH_NODE_URLS")
+        endpoints = self.ranked()
+        if self.hedge_after > 0 and method not in WRITE_METHODS and len(endpoints) > 1:
+            return self._hedged(endpoints, method, params)
+
+        error = None
+        for endpoint in endpoints:
+            try:
+                return self._call(endpoint, method, params)
+            except Exception as e:
+                print(f"RPC {method} failed on {endpoint.url}: {e}")
+                error = e
+        raise error
+
+    def _hedged(self, endpoints, method, params):
+        futures = {self._executor.submit(self._call, endpoints[0], method, params): endpoints[0]}
+        remaining = list(endpoints[1:])
+        error = None
+
+        while futures:
+            timeout = self.hedge_after if remaining else None
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                endpoint = remaining.pop(0)
+                futures[self._executor.submit(self._call, endpoint, method, params)] = endpoint
+                continue
+
+            for future in done:
+                endpoint = futures.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    print(f"RPC {method} failed on {endpoint.url}: {e}")
+                    error = e
+            if remaining and not futures:
+                endpoint = remaining.pop(0)
+                futures[self._executor.submit(self._call, endpoint, method, params)] = endpoint
+
+        raise error
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    "url": endpoint.url,
+                    "latency": endpoint.latency,
+                    "error_rate": endpoint.error_rate,
+                    "open": endpoint.open_until > time.monotonic(),
+                }
+                for endpoint in self.endpoints
+            ]
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    def __init__(self, pool, **kwargs):
+        self.pool = pool
+        super().__init__(**kwargs)
+
+    def __str__(self):
+        return f"RPC pool {[endpoint.url for endpoint in self.pool.endpoints]}"
+
+    def make_request(self, method, params):
+        return self.pool.request(method, params)
+
+
+base_rpc_pool = RpcPool(ETH_NODE_URLS)
@@ -0,0 +1,71 @@
+import os
+import base64
+import hashlib
+
+from eth_account import Account
+from solders.keypair import Keypair
+
+from apexbtbot.cache import TTLCache
+from apexbtbot.wallet import cipher
+
+SIGNER_CACHE_SIZE = int(os.getenv("SIGNER_CACHE_SIZE", 256))
+SIGNER_CACHE_TTL = int(os.getenv("SIGNER_CACHE_TTL", 300))
+
+
+def _zeroize(secret):
+    for i in range(len(secret)):
+        secret[i] = 0
+
+
+class SolanaSigner:
+    def __init__(self, secret):
+        # secret is the decrypted, base64 encoded keypair as a mutable buffer.
+        self._secret = secret
+        self.keypair = Keypair.from_bytes(base64.b64decode(bytes(secret)))
+
+    @property
+    def secret(self):
+        # A view, not a copy, so zeroize() also wipes what callers were handed.
+        return memoryview(self._secret)
+
+    def zeroize(self):
+        _zeroize(self._secret)
+        self.keypair = None
+
+
+class EvmSigner:
+    def __init__(self, secret):
+        # secret is the decrypted, hex encoded private key as a mutable buffer.
+        self._secret = secret
+        self.account = Account.from_key(secret.decode())
+
+    def zeroize(self):
+        _zeroize(self._secret)
+        self.account = None
+
+
+# Evicted signers are wiped; callers keep their own reference to the keypair
+# or account for the duration of a trade.
+signer_cache = TTLCache(
+    maxsize=SIGNER_CACHE_SIZE, ttl=SIGNER_CACHE_TTL, on_evict=lambda signer: signer.zeroize()
+)
+
+
+def _get_signer(signer_class, encrypted_key):
+    signer_cache.purge_expired()
+
+    cache_key = (signer_class.__name__, hashlib.sha256(encrypted_key.encode()).hexdigest())
+    signer = signer_cache.get(cache_key)
+    if signer is None:
+        secret = bytearray(cipher.decrypt(encrypted_key.encode()))
+        signer = signer_class(secret)
+        signer_cache.set(cache_key, signer)
+    return signer
+
+
+def get_solana_signer(encrypted_key):
+    return _get_signer(SolanaSigner, encrypted_key)
+
+
+def get_evm_signer(encrypted_key):
+    return _get_signer(EvmSigner, encrypted_key)
@@ -0,0 +1,56 @@
+import base64
+
+import base58
+import numpy as np
+from solana.rpc.types import DataSliceOpts
+
+from apexbtbot.constants import ACCOUNT_LAYOUT_LEN
+
+# dataSlice ranges of an SPL token account: mint, owner and amount for
+# balance discovery, or just the u64 amount for vault reserves.
+TOKEN_ACCOUNT_BALANCE_SLICE = DataSliceOpts(offset=0, length=72)
+TOKEN_ACCOUNT_AMOUNT_SLICE = DataSliceOpts(offset=64, length=8)
+
+
+def token_account_dtype(length=ACCOUNT_LAYOUT_LEN):
+    # SPL token account: mint (32), owner (32), amount (u64 LE), then the
+    # rest of the layout, which we never read.
+    fields = [("mint", "u1", 32), ("owner", "u1", 32), ("amount", "<u8")]
+    if length > 72:
+        fields.append(("rest", f"V{length - 72}"))
+    return np.dtype(fields)
+
+
+def token_accounts_buffer(accounts, length=ACCOUNT_LAYOUT_LEN):
+    # Raw account data of a base64 getTokenAccountsByOwner/getProgramAccounts
+    # response as one contiguous buffer. When length is a multiple of 3 every
+    # encoded account is unpadded, so the strings can be joined and decoded
+    # in a single call.
+    encoded = [account["account"]["data"][0] for account in accounts]
+    if length % 3 == 0 and all(len(data) == length // 3 * 4 for data in encoded):
+        return base64.b64decode("".join(encoded))
+
+    raw = (base64.b64decode(data) for data in encoded)
+    return b"".join(data for data in raw if len(data) == length)
+
+
+def decode_token_accounts(accounts, length=ACCOUNT_LAYOUT_LEN):
+    return np.frombuffer(token_accounts_buffer(accounts, length), dtype=token_account_dtype(length))
+
+
+def decode_token_amount(data):
+    # data is the TOKEN_ACCOUNT_AMOUNT_SLICE of a token account.
+    return int.from_bytes(data[:8], "little")
+
+
+def token_balances_by_mint(accounts, length=ACCOUNT_LAYOUT_LEN):
+    # {mint: raw amount} over nonzero accounts only; base58 is the expensive
+    # step, so it runs after filtering. Accounts sharing a mint are summed.
+    decoded = decode_token_accounts(accounts, length)
+    held = decoded[decoded["amount"] > 0]
+
+    balances = {}
+    for mint, amount in zip(held["mint"], held["amount"].tolist()):
+        mint = base58.b58encode(mint.tobytes()).decode()
+        balances[mint] = balances.get(mint, 0) + amount
+    return balances
@@ -6,6 +6,7 @@ from solders.instruction import AccountMeta, Instruction  # type: ignore
 from solana.rpc.commitment import Processed
 from solana.rpc.types import MemcmpOpts
 
+from apexbtbot.solana.accounts import TOKEN_ACCOUNT_AMOUNT_SLICE, decode_token_amount
 from apexbtbot.solana.keys import AmmV4PoolKeys
 from apexbtbot.solana.layouts import LIQUIDITY_STATE_LAYOUT_V4, MARKET_STATE_LAYOUT_V3
 from apexbtbot.constants import RAYDIUM_AMM_V4, DEFAULT_QUOTE_MINT, WSOL
@@ -143,25 +144,22 @@ def get_amm_v4_reserves(client, pool_keys: AmmV4PoolKeys) -> tuple:
         base_decimal = pool_keys.base_decimals
         base_mint = pool_keys.base_mint
 
-        balances_response = client.get_multiple_accounts_json_parsed(
-            [quote_vault, base_vault], Processed
+        # Only the 8 amount bytes of each vault; decimals come from the pool keys.
+        balances_response = client.get_multiple_accounts(
+            [quote_vault, base_vault], Processed, encoding="base64", data_slice=TOKEN_ACCOUNT_AMOUNT_SLICE
         )
         balances = balances_response.value
 
         quote_account = balances[0]
         base_account = balances[1]
 
-        quote_account_balance = quote_account.data.parsed["info"]["tokenAmount"][
-            "uiAmount"
-        ]
-        base_account_balance = base_account.data.parsed["info"]["tokenAmount"][
-            "uiAmount"
-        ]
-
-        if quote_account_balance is None or base_account_balance is None:
-            print("Error: One of the account balances is None.")
+        if quote_account is None or base_account is None:
+            print("Error: One of the vault accounts is missing.")
             return None, None, None
 
+        quote_account_balance = decode_token_amount(quote_account.data) / 10**quote_decimal
+        base_account_balance = decode_token_amount(base_account.data) / 10**base_decimal
+
         if base_mint == WSOL:
             base_reserve = quote_account_balance
             quote_reserve = base_account_balance
@@ -228,9 +226,10 @@ def get_amm_v4_pair_from_rpc(client, token_mint: str) -> list:
     )
 
 from typing import List, Dict, Optional
-import aiohttp
 import asyncio
 
+from apexbtbot import clients, ratelimit
+
 class JupiterAggregator:
     BASE_URL = "https://quote-api.jup.ag/v6"
     
@@ -242,32 +241,33 @@ class JupiterAggregator:
             amounts = [100000, 1000000, 10000000]  # 0.1 SOL, 1 SOL, 10 SOL
             all_routes = []
             
-            async with aiohttp.ClientSession() as session:
-                for amount in amounts:
-                    url = f"{self.BASE_URL}/quote"
-                    params = {
-                        "inputMint": input_mint,
-                        "outputMint": wsol_mint,
-                        "amount": str(amount),
-                        "slippageBps": 50,
-                        "onlyDirectRoutes": "true"  # Try to force direct routes
-                    }
-                    
-                    async with session.get(url, params=params) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            if 'routePlan' in data:
-                                for route in data['routePlan']:
-                                    swap_info = route['swapInfo']
-                                    # Only collect direct routes between input and WSOL
-                                    if (swap_info['inputMint'] == input_mint and 
-                                        swap_info['outputMint'] == wsol_mint):
-                                        all_routes.append({
-                                            'pool_id': swap_info['ammKey'],
-                                            'label': swap_info['label'],
-                                            'fee_amount': swap_info['feeAmount'],
-                                            'direct_route': True
-                                        })
+            session = clients.http_client()
+            for amount in amounts:
+                url = f"{self.BASE_URL}/quote"
+                params = {
+                    "inputMint": input_mint,
+                    "outputMint": wsol_mint,
+                    "amount": str(amount),
+                    "slippageBps": 50,
+                    "onlyDirectRoutes": "true"  # Try to force direct routes
+                }
+                
+                await ratelimit.limiter("jupiter").acquire()
+                response = await session.get(url, params=params)
+                if response.status_code == 200:
+                    data = response.json()
+                    if 'routePlan' in data:
+                        for route in data['routePlan']:
+                            swap_info = route['swapInfo']
+                            # Only collect direct routes between input and WSOL
+                            if (swap_info['inputMint'] == input_mint and 
+                                swap_info['outputMint'] == wsol_mint):
+                                all_routes.append({
+                                    'pool_id': swap_info['ammKey'],
+                                    'label': swap_info['label'],
+                                    'fee_amount': swap_info['feeAmount'],
+                                    'direct_route': True
+                                })
             
             # Remove duplicates while preserving order
             seen = set()
@@ -1,7 +1,6 @@
 import base64
 import asyncio 
 import os
-import httpx
 import subprocess 
 from dataclasses import dataclass
 
@@ -9,11 +8,13 @@ from solana.rpc.types import TxOpts
 from solders import message
 from solders.transaction import VersionedTransaction  # type: ignore
 from solana.rpc.commitment import Confirmed
+from apexbtbot import clients, ratelimit
 from apexbtbot.constants import WSOL_RAW
 from solders.keypair import Keypair # type: ignore
 from pprint import pprint 
 from dotenv import load_dotenv
 
+from apexbtbot.signers import SolanaSigner
 from apexbtbot.solana.util import parse_base58_tx
 
 load_dotenv()
@@ -22,7 +23,7 @@ SOL_NODE_URL = os.getenv("SOL_NODE_URL")
 
 @dataclass
 class BuyTokenParams:
-    private_key: str
+    signer: SolanaSigner
     token_mint: str         
     sol_amount: float  
     slippage: int = 200
@@ -30,7 +31,7 @@ class BuyTokenParams:
 
 @dataclass
 class SellTokenParams:
-    private_key: str
+    signer: SolanaSigner
     token_mint: str         
     token_amount: float  
     token_decimals: int   
@@ -78,7 +79,8 @@ async def __quote(input_mint: str, output_mint: str, amount: float, decimals: in
         "amount": int(amount * 10**decimals),
     }
     
-    response = await httpx.AsyncClient().get(url, params=params)
+    await ratelimit.limiter("jupiter").acquire(priority=True)
+    response = await clients.http_client().get(url, params=params)
     return response.json()
 
 async def __swap(quote_response, keypair):
@@ -91,7 +93,8 @@ async def __swap(quote_response, keypair):
         "dynamicComputeUnitLimit": True,
         "prioritizationFeeLamports": 'auto',
     }
-    swap_response = await httpx.AsyncClient().post(url, json=payload)
+    await ratelimit.limiter("jupiter").acquire(priority=True)
+    swap_response = await clients.http_client().post(url, json=payload)
 
     return swap_response.json()
 
@@ -99,30 +102,25 @@ async def _execute_swap(
     input_mint: str,
     output_mint: str,
     amount: int,
-    private_key: str,
+    signer: SolanaSigner,
     slippage: int,
     rpc: str
 ):
-    
-    print(input_mint)
-    print(output_mint)
-    print(amount)
-    print(private_key)
-    print(slippage)
     try:
+        # The key goes over stdin, never on the command line or to stdout.
         process = await asyncio.create_subprocess_exec(
             'node', 'js/swap.js',
-            '--private-key', private_key,
             '--input-mint', input_mint,
             '--output-mint', output_mint,
             '--amount', str(amount),
             '--slippage', str(slippage),
             '--rpc', rpc,
+            stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE
         )
         
-        stdout, stderr = await process.communicate()
+        stdout, stderr = await process.communicate(input=signer.secret)
         
         if process.returncode != 0:
             print(f"Error: {stderr.decode()}")
@@ -151,7 +149,7 @@ async def _buy(params: BuyTokenParams):
         input_mint=WSOL_RAW,
         output_mint=params.token_mint,
         amount=amount,
-        private_key=params.private_key,
+        signer=params.signer,
         slippage=params.slippage,
         rpc=params.rpc
     )
@@ -165,7 +163,7 @@ async def _sell(params: SellTokenParams):
         input_mint=params.token_mint,
         output_mint=WSOL_RAW,
         amount=amount,
-        private_key=params.private_key,
+        signer=params.signer,
         slippage=params.slippage,
         rpc=params.rpc
     )
@@ -1,7 +1,7 @@
 import time
 import json
 from enum import Enum
-import requests 
+import httpx
 from urllib.parse import quote
 
 from solana.rpc.types import TokenAccountOpts
@@ -9,7 +9,10 @@ from solana.rpc.commitment import Processed, Confirmed
 from solders.pubkey import Pubkey  # type: ignore
 from solders.signature import Signature  # type: ignore
 
+from apexbtbot import clients, ratelimit
 from apexbtbot.constants import WSOL_RAW
+from apexbtbot.prices import SOL_USD, price_cache, token_price_cache
+from apexbtbot.token_metadata import token_metadata
 
 
 def get_token_balance(client, mint_str: str, payer_keypair) -> float | None:
@@ -85,44 +88,103 @@ def tokens_for_sol(
     return round(sol_received, 9)
 
 
-def get_token_price(token_address):
-    url = f"https://api-v3.raydium.io/mint/price?mints={token_address}"
+async def _fetch_raydium_price(mint):
+    url = f"https://api-v3.raydium.io/mint/price?mints={mint}"
+
+    try:
+        await ratelimit.limiter("raydium").acquire()
+        response = (await clients.http_client().get(url, timeout=5)).json()
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"Error getting token price from radiyum: {e}")
+        return None
+
+    if response['success'] == False or not response['data'].get(mint):
+        print("Error getting token price from radiyum")
+        return None
+
+    return float(response['data'][mint])
+
+async def fetch_raydium_prices(mints):
+    # None when the request failed, so callers can tell it from "no prices".
+    url = f"https://api-v3.raydium.io/mint/price?mints={','.join(mints)}"
+
+    try:
+        await ratelimit.limiter("raydium").acquire()
+        response = (await clients.http_client().get(url, timeout=5)).json()
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"Error getting token prices from radiyum: {e}")
+        return None
 
-    response = requests.get(url).json()
     if response['success'] == False:
-        print(f"Error getting token price from radiyum")
+        print("Error getting token prices from radiyum")
+        return None
+
+    return {mint: float(price) for mint, price in response['data'].items() if price}
+
+async def _fetch_jupiter_price(mint):
+    url = f"https://api.jup.ag/price/v2?ids={mint}"
+
+    try:
+        await ratelimit.limiter("jupiter").acquire()
+        response = (await clients.http_client().get(url, timeout=5)).json()
+        return float(response['data'][mint]['price'])
+    except (httpx.HTTPError, KeyError, TypeError, ValueError) as e:
+        print(f"Error getting token price from jupiter: {e}")
+        return None
+
+async def _fetch_sol_price():
+    return await _fetch_raydium_price(WSOL_RAW) or await _fetch_jupiter_price(WSOL_RAW)
+
+async def get_token_price(token_address):
+    price_in_usd = await token_price_cache.get(
+        ("solana", token_address), lambda: _fetch_raydium_price(token_address)
+    )
+    sol_price = await get_sol_price()
+    if price_in_usd is None or not sol_price:
         return None, None
-    
-    price_in_usd = float(response['data'][token_address])
-    sol_price = get_sol_price()
+
     price_in_sol = price_in_usd / sol_price
 
     return price_in_sol, price_in_usd
     
-def get_sol_price():
-    url = f"https://api-v3.raydium.io/mint/price?mints={WSOL_RAW}"
+async def get_sol_price():
+    return await price_cache.get(SOL_USD, _fetch_sol_price)
 
-    response = requests.get(url).json()
-    if response['success'] == False:
-        print(f"Error getting SOL price from radiyum")
-        return None
-    
-    price_in_usd = float(response['data'][WSOL_RAW])
-    return price_in_usd
+async def fetch_raydium_mint_info(mints):
+    # Shaped for TokenMetadataStore: mints Raydium does not know map to None,
+    # and a failed request returns nothing so it is retried next time.
+    url = f"https://api-v3.raydium.io/mint/ids?mints={','.join(mints)}"
 
-def get_token_info(token_address):
-    
-    url = f"https://api-v3.raydium.io/mint/ids?mints={token_address}"
+    try:
+        await ratelimit.limiter("raydium").acquire()
+        response = (await clients.http_client().get(url, timeout=5)).json()
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"Error getting token information from radiyum: {e}")
+        return {}
 
-    response = requests.get(url).json()
     if response['success'] == False:
-        print(f"Error getting token information from radiyum")
+        print("Error getting token information from radiyum")
+        return {}
+
+    mint_info = dict.fromkeys(mints)
+    for data in response['data']:
+        if data:
+            mint_info[data['address']] = {
+                'name': data['name'],
+                'symbol': data['symbol'],
+                'decimals': data['decimals'],
+            }
+    return mint_info
+
+async def get_token_info(token_address):
+    metadata = await token_metadata.get("solana", token_address, fetch=fetch_raydium_mint_info)
+    if not metadata:
+        print("Error getting token information from radiyum")
         return None, None, None, None, None, None
-    
-    data = response['data'][0]
-    info = data['name'], data['symbol'], data['decimals']
 
-    prices = get_token_price(token_address)
+    info = metadata['name'], metadata['symbol'], metadata['decimals']
+
+    prices = await get_token_price(token_address)
 
     return *info, *prices
 
@@ -0,0 +1,103 @@
+import os
+
+from apexbtbot.cache import TTLCache
+
+TOKEN_METADATA_CACHE_SIZE = int(os.getenv("TOKEN_METADATA_CACHE_SIZE", 50_000))
+TOKEN_METADATA_NEGATIVE_TTL = int(os.getenv("TOKEN_METADATA_NEGATIVE_TTL", 3600))
+
+_MISSING = object()
+
+
+class TokenMetadataStore:
+    # Name, symbol and decimals never change, so found entries only leave the
+    # in-memory tier through LRU eviction. Unknown tokens are cached as None
+    # for negative_ttl so a newly launched token is picked up eventually.
+    def __init__(self, db=None, maxsize=TOKEN_METADATA_CACHE_SIZE, negative_ttl=TOKEN_METADATA_NEGATIVE_TTL):
+        self.db = db
+        self.negative_ttl = negative_ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=float("inf"))
+
+    @staticmethod
+    def _normalize(chain, address):
+        return address.lower() if chain == "base" else address
+
+    def _remember(self, chain, address, metadata):
+        ttl = None if metadata is not None else self.negative_ttl
+        self._cache.set((chain, self._normalize(chain, address)), metadata, ttl=ttl)
+
+    async def get(self, chain, address, fetch=None):
+        return (await self.get_many(chain, [address], fetch)).get(address)
+
+    async def get_many(self, chain, addresses, fetch=None):
+        # Returns {address: metadata or None}; addresses that could not be
+        # resolved at all (e.g. the fetch failed) are left out.
+        # fetch(addresses) must return the same shape.
+        found = {}
+        missing = []
+        for address in dict.fromkeys(addresses):
+            metadata = self._cache.get((chain, self._normalize(chain, address)), _MISSING)
+            if metadata is _MISSING:
+                missing.append(address)
+            else:
+                found[address] = metadata
+
+        if missing and self.db is not None:
+            try:
+                rows = await self.db.get_token_metadata(
+                    chain, [self._normalize(chain, address) for address in missing], self.negative_ttl
+                )
+            except Exception as e:
+                print(f"Error loading token metadata: {e}")
+                rows = []
+
+            by_address = {row["address"]: row for row in rows}
+            remaining = []
+            for address in missing:
+                row = by_address.get(self._normalize(chain, address))
+                if row is None:
+                    remaining.append(address)
+                    continue
+                metadata = None
+                if row["found"]:
+                    metadata = {"name": row["name"], "symbol": row["symbol"], "decimals": row["decimals"]}
+                self._remember(chain, address, metadata)
+                found[address] = metadata
+            missing = remaining
+
+        if missing and fetch is not None:
+            fetched = await fetch(missing)
+            await self.put_many(chain, fetched)
+            found.update(fetched)
+
+        return found
+
+    async def put_many(self, chain, items):
+        if not items:
+            return
+
+        for address, metadata in items.items():
+            self._remember(chain, address, metadata)
+
+        if self.db is None:
+            return
+
+        rows = []
+        for address, metadata in items.items():
+            metadata = metadata or {}
+            rows.append((
+                self._normalize(chain, address),
+                metadata.get("name"),
+                metadata.get("symbol"),
+                metadata.get("decimals"),
+                bool(metadata),
+            ))
+        try:
+            await self.db.save_token_metadata(chain, rows)
+        except Exception as e:
+            print(f"Error saving token metadata: {e}")
+
+    def stats(self):
+        return self._cache.stats()
+
+
+token_metadata = TokenMetadataStore()
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime
+
+from psycopg import DataError, IntegrityError
+
+_STOP = object()
+
+
+class TransactionLogger:
+    def __init__(self, db, batch_size=100, flush_interval=0.5, shutdown_retries=3):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.shutdown_retries = shutdown_retries
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    def log(self, user_id, transaction_type, chain, token, amount):
+        # created_at is taken now, not at flush time, so history stays accurate.
+        self._queue.put_nowait(
+            (user_id, transaction_type, chain, token, amount, datetime.now())
+        )
+
+    async def close(self):
+        if not self._task:
+            return
+        self._queue.put_nowait(_STOP)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            record = await self._queue.get()
+            if record is _STOP:
+                break
+
+            batch = [record]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+
+            if stopping:
+                await self._flush_final(batch)
+                break
+
+            pending = await self._flush(batch)
+            if pending:
+                for record in pending:
+                    self._queue.put_nowait(record)
+                await asyncio.sleep(self.flush_interval)
+
+        # Anything queued behind the stop marker still gets written.
+        remaining = []
+        while not self._queue.empty():
+            record = self._queue.get_nowait()
+            if record is not _STOP:
+                remaining.append(record)
+        if remaining:
+            await self._flush_final(remaining)
+
+    async def _flush(self, batch):
+        # Returns the records that still need writing.
+        try:
+            await self.db.log_transactions(batch)
+            return []
+        except (DataError, IntegrityError) as e:
+            print(f"Batch of {len(batch)} transactions rejected ({e}), retrying row by row")
+        except Exception as e:
+            print(f"Error flushing {len(batch)} transactions, will retry: {e}")
+            return batch
+
+        # One bad row must not poison the whole batch; write the rest
+        # individually and drop the offenders.
+        for index, record in enumerate(batch):
+            try:
+                await self.db.log_transactions([record])
+            except (DataError, IntegrityError) as e:
+                print(f"Dropping transaction record {record}: {e}")
+            except Exception as e:
+                print(f"Error flushing transactions, will retry: {e}")
+                return batch[index:]
+        return []
+
+    async def _flush_final(self, batch):
+        for attempt in range(self.shutdown_retries):
+            batch = await self._flush(batch)
+            if not batch:
+                return
+            await asyncio.sleep(self.flush_interval * (2**attempt))
+        print(f"Failed to flush {len(batch)} transactions on shutdown: {batch}")
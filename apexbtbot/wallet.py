@@ -1,21 +1,23 @@
 import os
+import asyncio
 import base64
-import base58 
-
-import requests
 
 from cryptography.fernet import Fernet
 from web3 import Web3
+from eth_account import Account
 from solders.keypair import Keypair
 from solders.pubkey import Pubkey
-from solana.rpc.api import Client
 from dotenv import load_dotenv
 from spl.token.client import Token
 from spl.token.constants import TOKEN_PROGRAM_ID
 from solana.rpc.commitment import Confirmed
 from solana.rpc.types import TokenAccountOpts
 
-from apexbtbot.alchemy import AlchemyAPIWrapper
+from apexbtbot import clients
+from apexbtbot.portfolio import Portfolio
+from apexbtbot.solana import util as solana_utils
+from apexbtbot.solana.accounts import TOKEN_ACCOUNT_BALANCE_SLICE, token_balances_by_mint
+from apexbtbot.token_metadata import token_metadata
 
 load_dotenv()
 
@@ -23,16 +25,16 @@ ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
 ETH_NODE_URL = os.getenv("ETH_NODE_URL")
 PRICES_NODE_URL = os.getenv("PRICES_NODE_URL")
 SOLANA_RPC_URL = os.getenv("SOL_NODE_URL")
+EVM_BALANCE_PAGE_CONCURRENCY = int(os.getenv("EVM_BALANCE_PAGE_CONCURRENCY", 4))
 
 cipher = Fernet(ENCRYPTION_KEY)
 
-alchemy = AlchemyAPIWrapper(ETH_NODE_URL)
+alchemy = clients.alchemy_api()
 
 class Wallet:
     @staticmethod
     def create_evm_wallet():
-        w3 = Web3(Web3.HTTPProvider(ETH_NODE_URL))
-        account = w3.eth.account.create()
+        account = Account.create()
         private_key = account.key.hex()
         encrypted_private_key = cipher.encrypt(private_key.encode()).decode()
         return {
@@ -41,13 +43,15 @@ class Wallet:
         }
 
     @staticmethod
-    def get_evm_balance(address):
-        w3 = Web3(Web3.HTTPProvider(ETH_NODE_URL))
+    def get_evm_balance(address, strict=False):
+        w3 = clients.base_web3()
         try:
             balance_wei = w3.eth.get_balance(address)  
             balance_eth = w3.from_wei(balance_wei, 'ether')  
             return float(balance_eth)
         except Exception as e:
+            if strict:
+                raise
             print(f"Error fetching EVM wallet balance: {e}")
             return 0.0
 
@@ -62,13 +66,15 @@ class Wallet:
         }
 
     @staticmethod
-    def get_solana_balance(public_key):
-        client = Client(SOLANA_RPC_URL)
+    def get_solana_balance(public_key, strict=False):
+        client = clients.solana_client()
         pubkey = Pubkey.from_string(public_key)
         response = client.get_balance(pubkey)
 
         if response['result']:
             return response['result']['value'] / 1e9 
+        elif strict:
+            raise Exception(f"Failed to fetch SOL balance: {response}")
         else:
             return 0
 
@@ -113,18 +119,13 @@ class Wallet:
         return False
 
     @staticmethod
-    def process_token_metadata(alchemy, token, token_info_dict):
+    def process_token_metadata(token, metadata):
         try:
             contract_address = token["contractAddress"]
             raw_balance = int(token["tokenBalance"], 16)
             if raw_balance <= 0:
                 return None
                 
-            metadata_response = alchemy.get_token_metadata(contract_address)
-            if not metadata_response or 'result' not in metadata_response:
-                return None
-                
-            metadata = metadata_response['result']
             if Wallet.is_spam_token(metadata):
                 return None
                 
@@ -154,128 +155,197 @@ class Wallet:
             return None
 
     @staticmethod
-    def fetch_token_prices(alchemy, tokens_to_price, token_info_dict):
+    async def fetch_evm_token_metadata(alchemy, token_addresses):
+        # Shaped for TokenMetadataStore: Alchemy answers non-token contracts
+        # with empty fields, which become negative entries.
+        results = await alchemy.get_token_metadata_batch_async(token_addresses)
+        return {
+            address: {
+                'name': metadata.get('name'),
+                'symbol': metadata.get('symbol'),
+                'decimals': metadata.get('decimals'),
+            } if metadata.get('decimals') is not None else None
+            for address, metadata in results.items()
+            if metadata is not None
+        }
+
+    @staticmethod
+    async def fetch_token_prices(alchemy, tokens_to_price, token_info_dict, strict=False):
         try:
             if not tokens_to_price:
                 return token_info_dict
                 
-            prices_payload = {"addresses": tokens_to_price}
-            prices_response = alchemy._make_request_with_retry(prices_payload, prices=True, endpoint="tokens/by-address")
-            
-            if prices_response and 'data' in prices_response:
-                for token_data in prices_response['data']:
-                    address = token_data.get('address')
-                    if address in token_info_dict:
-                        try:
-                            price = float(token_data.get('prices', [])[0].get('value', 0.0))
-                            token_info_dict[address]['price_in_usd'] = price
-                            token_info_dict[address]['value_in_usd'] = price * token_info_dict[address]['balance']
-                        except (IndexError, ValueError) as e:
-                            print(f"Error processing price for {address}: {e}")
+            for token_data in await alchemy.get_token_prices_async(tokens_to_price, strict=strict):
+                address = token_data.get('address')
+                if address in token_info_dict:
+                    try:
+                        price = float(token_data.get('prices', [])[0].get('value', 0.0))
+                        token_info_dict[address]['price_in_usd'] = price
+                        token_info_dict[address]['value_in_usd'] = price * token_info_dict[address]['balance']
+                    except (IndexError, ValueError) as e:
+                        print(f"Error processing price for {address}: {e}")
                             
             return token_info_dict
             
         except Exception as e:
+            if strict:
+                raise
             print(f"Error fetching batch prices: {e}")
             return token_info_dict
 
     @staticmethod
-    def get_evm_token_balances(wallet_address, with_address=False):
-        alchemy = AlchemyAPIWrapper(ETH_NODE_URL)
-        
-        response = alchemy.get_token_balances(wallet_address)
-        if not response:
-            return {}
-            
-        token_balances = response.get("result", {}).get("tokenBalances", [])
+    async def price_evm_token_page(alchemy, token_balances, strict=False):
+        token_balances = [
+            token for token in token_balances
+            if int(token["tokenBalance"], 16) > 0
+        ]
         token_info_dict = {}
         tokens_to_price = []
+
+        metadata_by_address = await token_metadata.get_many(
+            "base",
+            [token["contractAddress"] for token in token_balances],
+            fetch=lambda addresses: Wallet.fetch_evm_token_metadata(alchemy, addresses),
+        )
+        if strict and len(metadata_by_address) < len({token["contractAddress"] for token in token_balances}):
+            raise Exception("Failed to fetch token metadata")
         
         for token in token_balances:
-            token_data = Wallet.process_token_metadata(alchemy, token, token_info_dict)
+            token_data = Wallet.process_token_metadata(token, metadata_by_address.get(token["contractAddress"]))
             if token_data:
                 token_info_dict[token_data['address']] = token_data['info']
                 tokens_to_price.append(token_data['network_info'])
         
-        token_info_dict = Wallet.fetch_token_prices(alchemy, tokens_to_price, token_info_dict)
+        return await Wallet.fetch_token_prices(alchemy, tokens_to_price, token_info_dict, strict=strict)
+
+    @staticmethod
+    async def unpriced_evm_token_page(token_balances):
+        # Fallback for a page that could not be priced: list its tokens with a
+        # price of 0, using only metadata that is already stored.
+        metadata_by_address = await token_metadata.get_many(
+            "base", [token["contractAddress"] for token in token_balances]
+        )
+        token_info_dict = {}
+        for token in token_balances:
+            token_data = Wallet.process_token_metadata(token, metadata_by_address.get(token["contractAddress"]))
+            if token_data:
+                token_info_dict[token_data['address']] = token_data['info']
+        return token_info_dict
+
+    @staticmethod
+    async def stream_evm_token_balances(wallet_address, concurrency=EVM_BALANCE_PAGE_CONCURRENCY, strict=False):
+        # Yields (address, token_info) as soon as the page holding the token
+        # is priced, while later pages are still being fetched. When strict,
+        # any failure is raised instead of leaving tokens out.
+        results = asyncio.Queue()
+        slots = asyncio.Semaphore(concurrency)
+        tasks = []
+
+        async def price_page(page):
+            try:
+                results.put_nowait(await Wallet.price_evm_token_page(alchemy, page, strict=strict))
+            except Exception as e:
+                if strict:
+                    results.put_nowait(e)
+                else:
+                    print(f"Error pricing token balance page, listing it unpriced: {e}")
+                    results.put_nowait(await Wallet.unpriced_evm_token_page(page))
+            finally:
+                slots.release()
+
+        async def produce():
+            try:
+                async for page in alchemy.iter_token_balance_pages(wallet_address):
+                    await slots.acquire()
+                    tasks.append(asyncio.create_task(price_page(page)))
+                await asyncio.gather(*tasks)
+            except Exception as e:
+                if strict:
+                    results.put_nowait(e)
+                else:
+                    print(f"Error fetching token balances: {e}")
+            finally:
+                results.put_nowait(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while (token_info_dict := await results.get()) is not None:
+                if isinstance(token_info_dict, Exception):
+                    raise token_info_dict
+                for address, token_info in token_info_dict.items():
+                    yield address, token_info
+        finally:
+            producer.cancel()
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    async def get_evm_token_balances(wallet_address, with_address=False, strict=False):
+        token_info_dict = {
+            address: token_info
+            async for address, token_info in Wallet.stream_evm_token_balances(wallet_address, strict=strict)
+        }
         
         if with_address:
             return token_info_dict, list(token_info_dict.keys())
         return token_info_dict
     
     @staticmethod
-    def build_evm_balance_string(wallet_address, no_title=False, no_eth=False):
-        
-        token_balances = Wallet.get_evm_token_balances(wallet_address)
-        eth_balance = Wallet.get_evm_balance(wallet_address)
-        eth_value_in_usd = alchemy.get_eth_price() * eth_balance
-
-        balance_compiled_message = f"ETH: <code>{eth_balance:.4f} (${eth_value_in_usd:.2f})</code>\n"
-        total_usd_value = eth_value_in_usd
-
-        for _, data in token_balances.items():
-            balance = data["balance"]
-            symbol = data["symbol"]
-            value_in_usd = data["value_in_usd"]
+    async def build_evm_portfolio(wallet_address, strict=False):
+        # strict raises on any failed fetch instead of reporting it as zero.
+        token_balances, eth_balance, eth_price = await asyncio.gather(
+            Wallet.get_evm_token_balances(wallet_address, strict=strict),
+            asyncio.to_thread(Wallet.get_evm_balance, wallet_address, strict),
+            alchemy.get_eth_price_async(strict=strict),
+        )
+        return Portfolio.from_token_balances("base", wallet_address, "ETH", eth_balance, eth_price, token_balances)
 
-            total_usd_value += value_in_usd
-
-            if no_eth and symbol == "ETH":
-                continue
-            
-            if balance > 0.0:
-                balance_compiled_message += f"{symbol}: <code>{balance:.4f} (${value_in_usd:.2f})</code>\n"
-                    
-        balance_message = ""
-
-        if not no_title:
-            balance_message = f"<b>EVM Wallet Positions:</b>\n\n"
-            balance_message += f"Total Portfolio Value: <code>${total_usd_value:.2f}</code>\n\n"
-            balance_message += "<b>Your Positions:</b>\n"
-
-        balance_message += balance_compiled_message
-        return balance_message
+    @staticmethod
+    async def build_evm_balance_string(wallet_address, no_title=False, no_eth=False):
+        portfolio = await Wallet.build_evm_portfolio(wallet_address)
+        return portfolio.render(no_title=no_title, no_native=no_eth)
     
     @staticmethod
-    def get_solana_token_balances(public_key):
-        client = Client(SOLANA_RPC_URL, commitment=Confirmed)
+    async def get_solana_token_balances(public_key, strict=False):
+        client = clients.solana_client()
         pubkey = Pubkey.from_string(public_key)
         try:
-            response = client.get_token_accounts_by_owner(
+            response = await asyncio.to_thread(
+                client.get_token_accounts_by_owner,
                 pubkey,
-                TokenAccountOpts(program_id=TOKEN_PROGRAM_ID, encoding="base64")
+                TokenAccountOpts(
+                    program_id=TOKEN_PROGRAM_ID,
+                    encoding="base64",
+                    data_slice=TOKEN_ACCOUNT_BALANCE_SLICE,
+                ),
+                Confirmed,
             )
 
-            token_balances = {}
-
-            for account in response['result']['value']:
-                account_data = account['account']['data']
-                raw_data = base64.b64decode(account_data[0])
-                mint = str(base58.b58encode(raw_data[:32]), 'utf-8')
-                amount = int.from_bytes(raw_data[64:72], 'little')
-                token_balances[mint] = amount 
+            token_balances = token_balances_by_mint(
+                response['result']['value'], length=TOKEN_ACCOUNT_BALANCE_SLICE.length
+            )
 
-            
-            mint_data_url = f"https://api-v3.raydium.io/mint/ids?mints={','.join(token_balances.keys())}"
-            price_data_url = f"https://api-v3.raydium.io/mint/price?mints={','.join(token_balances.keys())}"
-            
-            mint_data_response = requests.get(mint_data_url, timeout=5).json()
-            price_data_response = requests.get(price_data_url, timeout=5).json()
+            if not token_balances:
+                return {}
 
-        
-            if mint_data_response['success'] == True:
-                mint_data = mint_data_response['data']
-            
-            if price_data_response['success'] == True:
-                price_data = price_data_response['data']
+            mint_data, price_data = await asyncio.gather(
+                token_metadata.get_many(
+                    "solana", list(token_balances.keys()), fetch=solana_utils.fetch_raydium_mint_info
+                ),
+                solana_utils.fetch_raydium_prices(list(token_balances.keys())),
+            )
+            if strict and (price_data is None or len(mint_data) < len(token_balances)):
+                raise Exception("Failed to fetch Solana token prices or metadata")
+            price_data = price_data or {}
 
             built_token_balances = {}
-            for data in mint_data:
-                address = data['address']
+            for address, data in mint_data.items():
+                if not data:
+                    continue
                 symbol = data['symbol']
                 name = data['name']
                 decimals = data['decimals']
-                price = float(price_data[address])
+                price = price_data.get(address, 0.0)
                 balance = token_balances[address] / (10 ** decimals)
 
                 if balance <= 0:
@@ -293,53 +363,41 @@ class Wallet:
             
             
         except Exception as e:
+            if strict:
+                raise
             print(f"Error fetching Solana token balances: {e}")
             return {}
 
     @staticmethod
-    def build_solana_balance_string(public_key, no_title=False, no_sol=False):
-        token_balances = Wallet.get_solana_token_balances(public_key)
-        sol_balance = Wallet.get_solana_balance(public_key)
-
-        try:
-            sol_price_response = requests.get(
-                "https://api.jup.ag/price/v2?ids=So11111111111111111111111111111111111111112",
-                timeout=5
-            ).json()
-            sol_price = float(sol_price_response['data']['So11111111111111111111111111111111111111112']['price'])
-        except (requests.exceptions.RequestException, KeyError, ValueError):
+    async def build_solana_portfolio(public_key, strict=False):
+        token_balances, sol_balance, sol_price = await asyncio.gather(
+            Wallet.get_solana_token_balances(public_key, strict=strict),
+            asyncio.to_thread(Wallet.get_solana_balance, public_key, strict),
+            solana_utils.get_sol_price(),
+        )
+        if sol_price is None:
+            if strict:
+                raise Exception("Failed to fetch SOL price")
             print("Failed to fetch SOL price")
-            sol_price = 0
-            
-        sol_value_in_usd = sol_price * sol_balance
-        
-        balance_compiled_message = f"SOL: <code>{sol_balance:.4f} (${sol_value_in_usd:.2f})</code>\n"
-        total_usd_value = sol_value_in_usd
-        
-        for _, data in token_balances.items():
-            balance = data["balance"]
-            symbol = data["symbol"]
-            value_in_usd = data["value_in_usd"]
-
-            if no_sol and symbol in ["WSOL", "SOL"]:
-                continue
-            
-            total_usd_value += value_in_usd
-            
-            if balance > 0.0:
-                balance_compiled_message += f"{symbol}: <code>{balance:.4f} (${value_in_usd:.2f})</code>\n"
-                
-        balance_message = ""
-        
-        if not no_title:
-            balance_message = f"<b>Solana Wallet Positions:</b>\n\n"
-            balance_message += f"Total Portfolio Value: <code>${total_usd_value:.2f}</code>\n\n"
-            balance_message += "<b>Your Positions:</b>\n"
-            
-        balance_message += balance_compiled_message
+        return Portfolio.from_token_balances("solana", public_key, "SOL", sol_balance, sol_price, token_balances)
 
-        return balance_message    
+    @staticmethod
+    async def build_solana_balance_string(public_key, no_title=False, no_sol=False):
+        portfolio = await Wallet.build_solana_portfolio(public_key)
+        return portfolio.render(no_title=no_title, no_native=no_sol)
     
     @staticmethod
     def get_keypair_from_private_key(private_key):
         return Keypair.from_bytes(private_key)
+
+
+def generate_wallet_pair():
+    # Module level so it can run in a ProcessPoolExecutor worker.
+    evm_wallet = Wallet.create_evm_wallet()
+    solana_wallet = Wallet.create_solana_wallet()
+    return {
+        "evm_address": evm_wallet["address"],
+        "evm_private_key": evm_wallet["encrypted_private_key"],
+        "solana_address": solana_wallet["address"],
+        "solana_private_key": solana_wallet["encrypted_private_key"],
+    }
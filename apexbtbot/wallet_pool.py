@@ -0,0 +1,84 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from apexbtbot.wallet import generate_wallet_pair
+
+
+class WalletPool:
+    def __init__(self, db, size=None, workers=None):
+        self.db = db
+        self.size = size or int(os.getenv("WALLET_POOL_SIZE", 50))
+        self.workers = workers or int(os.getenv("WALLET_POOL_WORKERS", 2))
+        self._executor = None
+        self._lock = asyncio.Lock()
+        self._refill_task = None
+
+    def _get_executor(self):
+        if not self._executor:
+            # Forking the threaded bot process can copy held locks into the
+            # children, so workers start from a fresh interpreter instead.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def generate(self, count):
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        return await asyncio.gather(
+            *(loop.run_in_executor(executor, generate_wallet_pair) for _ in range(count))
+        )
+
+    async def refill(self):
+        if self._lock.locked():
+            return 0
+
+        async with self._lock:
+            missing = self.size - await self.db.count_pooled_wallets()
+            if missing <= 0:
+                return 0
+
+            # Another process may top the pool up meanwhile; the insert only
+            # adds what is still missing and any extra wallets are discarded.
+            wallets = await self.generate(missing)
+            return await self.db.add_pooled_wallets(wallets, target_size=self.size)
+
+    async def assign(self, user_id):
+        wallet = await self.db.claim_pooled_wallet(user_id)
+        if not wallet:
+            wallet = await self._generate_inline(user_id)
+
+        self._schedule_refill()
+        return wallet
+
+    async def register(self, telegram_id, name):
+        # New users get their row and a pooled wallet in one round trip.
+        user, wallet = await self.db.add_user_with_pooled_wallet(telegram_id, name)
+        if user is None:
+            # A concurrent /start created the user first.
+            user, wallet = await self.db.get_user_with_wallet(telegram_id, primary=True)
+            if wallet is None:
+                wallet = await self.assign(user["id"])
+            return user, wallet
+
+        if wallet is None:
+            wallet = await self._generate_inline(user["id"])
+        self._schedule_refill()
+        return user, wallet
+
+    async def _generate_inline(self, user_id):
+        print("Wallet pool is empty, generating a wallet inline")
+        (wallet,) = await self.generate(1)
+        await self.db.add_wallet(user_id=user_id, **wallet)
+        return wallet
+
+    def _schedule_refill(self):
+        if not self._refill_task or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self.refill())
+
+    async def close(self):
+        if self._executor:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
@@ -1,5 +1,10 @@
+import asyncio
+import httpx
 from web3 import Web3
-from apexbtbot import abi
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError
+from apexbtbot import abi, clients, ratelimit
+from apexbtbot.prices import ETH_USD, price_cache
+from apexbtbot.token_metadata import token_metadata
 import requests
 
 UNISWAP_SWAP_ROUTER_ADDRESS = "0x33128a8fC17869897dcE68Ed026d694621f6FDfD" 
@@ -8,27 +13,54 @@ UNISWAP_FACTORY_ROUTER_ADDRESS = "0x33128a8fC17869897dcE68Ed026d694621f6FDfD"
 
 WETH = "0x4200000000000000000000000000000000000006"
 
-def fetch_eth_to_usd():
+async def _fetch_coingecko_eth_price():
     url = "https://api.coingecko.com/api/v3/simple/price?ids=ethereum&vs_currencies=usd"
     try:
-        response = requests.get(url, timeout=10)
+        await ratelimit.limiter("coingecko").acquire()
+        response = await clients.http_client().get(url, timeout=10)
         response.raise_for_status()
         data = response.json()
         eth_to_usd = data["ethereum"]["usd"]
         return eth_to_usd
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error fetching ETH/USD price: {e}")
         return None
 
+async def fetch_eth_to_usd():
+    return await price_cache.get(ETH_USD, _fetch_coingecko_eth_price)
+
+def _read_erc20_metadata(token_address, web3):
+    token_contract = web3.eth.contract(address=Web3.to_checksum_address(token_address), abi=abi.erc20)
+    return {
+        "name": token_contract.functions.name().call(),
+        "symbol": token_contract.functions.symbol().call(),
+        "decimals": token_contract.functions.decimals().call(),
+    }
+
+async def fetch_erc20_metadata(token_addresses, web3):
+    # Shaped for TokenMetadataStore: contracts that revert are not ERC-20
+    # tokens and map to None; transient RPC errors are left out.
+    metadata = {}
+    for token_address in token_addresses:
+        try:
+            metadata[token_address] = await asyncio.to_thread(_read_erc20_metadata, token_address, web3)
+        except (BadFunctionCallOutput, ContractLogicError):
+            metadata[token_address] = None
+        except Exception as e:
+            print(f"Error fetching metadata for token {token_address}: {e}")
+    return metadata
+
 async def get_token_info(token_address, web3):
     try:
         WETH = "0x4200000000000000000000000000000000000006"
         
         token_address = Web3.to_checksum_address(token_address)
-        token_contract = web3.eth.contract(address=token_address, abi=abi.erc20)
-        name = token_contract.functions.name().call()
-        symbol = token_contract.functions.symbol().call()
-        decimals = token_contract.functions.decimals().call()
+        metadata = await token_metadata.get(
+            "base", token_address, fetch=lambda addresses: fetch_erc20_metadata(addresses, web3)
+        )
+        if not metadata:
+            raise Exception("Token metadata not found")
+        name, symbol, decimals = metadata["name"], metadata["symbol"], metadata["decimals"]
         
         # Use the correct ABI for factory
         factory = web3.eth.contract(
@@ -150,14 +182,16 @@ def get_token_address(symbol):
 
     base_url = "https://api.coingecko.com/api/v3/coins/list"
     try:
-        response = requests.get(base_url, timeout=10)
+        ratelimit.limiter("coingecko").acquire_blocking()
+        response = clients.http_session().get(base_url, timeout=10)
         response.raise_for_status()
         tokens = response.json()
 
         for token in tokens:
             if token["symbol"].lower() == symbol.lower():
                 token_details_url = f"https://api.coingecko.com/api/v3/coins/{token['id']}"
-                token_details_response = requests.get(token_details_url, timeout=10)
+                ratelimit.limiter("coingecko").acquire_blocking()
+                token_details_response = clients.http_session().get(token_details_url, timeout=10)
                 token_details_response.raise_for_status()
                 token_details = token_details_response.json()
 
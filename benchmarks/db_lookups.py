@@ -0,0 +1,114 @@
+"""Lookup latency for the hot wallet/transaction queries, before and after
+the schema version 2 indexes, on a scratch schema seeded with --rows rows.
+
+    python benchmarks/db_lookups.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+import psycopg
+from dotenv import load_dotenv
+
+from apexbtbot.queries import migrations
+
+load_dotenv()
+
+SCHEMA = "apexbtbot_bench"
+
+WALLET_QUERY = "SELECT * FROM wallets WHERE user_id = %s;"
+TRANSACTIONS_QUERY = "SELECT * FROM transactions WHERE user_id = %s ORDER BY created_at DESC;"
+
+
+def seed(conn, rows):
+    conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;")
+    conn.execute(f"CREATE SCHEMA {SCHEMA};")
+    conn.execute(f"SET search_path TO {SCHEMA};")
+
+    for statement in migrations[0][2]:
+        conn.execute(statement)
+
+    conn.execute(
+        """
+        INSERT INTO users (telegram_id, name)
+        SELECT g, 'user ' || g FROM generate_series(1, %s) AS g;
+        """,
+        (rows,),
+    )
+    conn.execute(
+        """
+        INSERT INTO wallets (user_id, evm_address, solana_address)
+        SELECT g, md5(g::text), md5((-g)::text) FROM generate_series(1, %s) AS g;
+        """,
+        (rows,),
+    )
+    # Roughly 100 trades per trader, spread over the last year.
+    conn.execute(
+        """
+        INSERT INTO transactions (user_id, transaction_type, chain, token, amount, created_at)
+        SELECT
+            1 + (g %% GREATEST(%s / 100, 1)),
+            CASE WHEN g %% 2 = 0 THEN 'buy' ELSE 'sell' END,
+            'base',
+            md5(g::text),
+            random() * 100,
+            now() - (random() * interval '365 days')
+        FROM generate_series(1, %s) AS g;
+        """,
+        (rows, rows),
+    )
+    conn.execute("ANALYZE;")
+    conn.commit()
+
+
+def measure(conn, query, max_id, samples):
+    timings = []
+    for _ in range(samples):
+        user_id = random.randint(1, max_id)
+        start = time.perf_counter()
+        conn.execute(query, (user_id,)).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def report(label, conn, rows, samples):
+    traders = max(rows // 100, 1)
+    for name, query, max_id in (
+        ("get_wallet_by_user_id", WALLET_QUERY, rows),
+        ("get_transactions_by_user_id", TRANSACTIONS_QUERY, traders),
+    ):
+        p50, p95 = measure(conn, query, max_id, samples)
+        print(f"{label:<10} {name:<30} p50={p50:8.3f}ms p95={p95:8.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    args = parser.parse_args()
+
+    with psycopg.connect(os.getenv("DATABASE_URL")) as conn:
+        print(f"Seeding {args.rows} rows into {SCHEMA}...")
+        seed(conn, args.rows)
+
+        report("no index", conn, args.rows, args.samples)
+
+        for statement in migrations[1][2]:
+            conn.execute(statement)
+        conn.execute("ANALYZE;")
+        conn.commit()
+
+        report("indexed", conn, args.rows, args.samples)
+
+        if not args.keep:
+            conn.execute(f"DROP SCHEMA {SCHEMA} CASCADE;")
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
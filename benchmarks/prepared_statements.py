@@ -0,0 +1,54 @@
+"""Checks that Database.execute really prepares hot statements: runs a query
+past DATABASE_PREPARE_THRESHOLD on a single pooled connection, then looks it
+up in pg_prepared_statements and compares latency before and after.
+
+    python benchmarks/prepared_statements.py --samples 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from apexbtbot.database import Database
+
+QUERY = "SELECT %s::int + 1 AS value;"
+
+
+async def measure(db, samples):
+    timings = []
+    for value in range(samples):
+        start = time.perf_counter()
+        await db.execute(QUERY, (value,), fetch_one=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    # One connection, so the statement is prepared where we look for it.
+    db = Database(min_size=1, max_size=1)
+    try:
+        first = await measure(db, 1)
+        rest = await measure(db, args.samples)
+
+        (statement,) = [s for s in db.prepared_statements() if s["query"] == QUERY]
+        prepared = [
+            row for row in await db.server_prepared_statements()
+            if row["statement"].strip() == QUERY.replace("%s", "$1")
+        ]
+
+        print(f"threshold={db.prepare_threshold} executions={statement['executions']} "
+              f"prepared_executions={statement['prepared_executions']}")
+        print(f"first p50={first:8.3f}ms  hot p50={rest:8.3f}ms")
+        if db.prepare_threshold and not prepared:
+            raise SystemExit("statement is not in pg_prepared_statements")
+        print(f"pg_prepared_statements: {[row['name'] for row in prepared]}")
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""Decode time for a getTokenAccountsByOwner response, comparing the old
+per-account loop with the vectorized NumPy decoder on full accounts and on
+dataSlice (mint, owner, amount) responses, on synthetic wallets.
+
+    python benchmarks/token_accounts.py --accounts 10000 --held 0.1
+"""
+import argparse
+import base64
+import os
+import random
+import statistics
+import time
+
+import base58
+
+from apexbtbot.constants import ACCOUNT_LAYOUT_LEN
+from apexbtbot.solana.accounts import TOKEN_ACCOUNT_BALANCE_SLICE, token_balances_by_mint
+
+SLICE_LENGTH = TOKEN_ACCOUNT_BALANCE_SLICE.length
+
+
+def make_accounts(count, held):
+    # Returns the same wallet as full accounts and as a dataSlice response.
+    accounts, sliced = [], []
+    for _ in range(count):
+        amount = random.randint(1, 10**12) if random.random() < held else 0
+        data = os.urandom(64) + amount.to_bytes(8, "little") + os.urandom(ACCOUNT_LAYOUT_LEN - 72)
+        accounts.append({"account": {"data": [base64.b64encode(data).decode(), "base64"]}})
+        sliced.append({"account": {"data": [base64.b64encode(data[:SLICE_LENGTH]).decode(), "base64"]}})
+    return accounts, sliced
+
+
+def payload_size(accounts):
+    return sum(len(account["account"]["data"][0]) for account in accounts)
+
+
+def per_account_loop(accounts):
+    token_balances = {}
+    for account in accounts:
+        raw_data = base64.b64decode(account["account"]["data"][0])
+        mint = str(base58.b58encode(raw_data[:32]), "utf-8")
+        amount = int.from_bytes(raw_data[64:72], "little")
+        token_balances[mint] = amount
+    return token_balances
+
+
+def measure(decode, accounts, samples):
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        decode(accounts)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, default=10_000)
+    parser.add_argument("--held", type=float, default=0.1, help="share of accounts with a nonzero balance")
+    parser.add_argument("--samples", type=int, default=20)
+    args = parser.parse_args()
+
+    accounts, sliced = make_accounts(args.accounts, args.held)
+    expected = {mint: amount for mint, amount in per_account_loop(accounts).items() if amount}
+    assert token_balances_by_mint(accounts) == expected
+    assert token_balances_by_mint(sliced, length=SLICE_LENGTH) == expected
+
+    print(f"{args.accounts} accounts, {len(expected)} with a balance")
+    print(f"account data: full={payload_size(accounts) / 1024:.0f}KiB dataSlice={payload_size(sliced) / 1024:.0f}KiB")
+    for name, decode, response in (
+        ("per-account loop", per_account_loop, accounts),
+        ("numpy", token_balances_by_mint, accounts),
+        ("numpy dataSlice", lambda response: token_balances_by_mint(response, length=SLICE_LENGTH), sliced),
+    ):
+        p50, p95 = measure(decode, response, args.samples)
+        print(f"{name:<20} p50={p50:8.3f}ms p95={p95:8.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
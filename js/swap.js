@@ -9,10 +9,6 @@ const argv = yargs(hideBin(process.argv))
         type: 'string',
         default: 'https://mainnet.helius-rpc.com/?api-key=d8965fa9-a70f-4b56-a16f-ee72dc18bd4f'
     })
-    .option('private-key', {
-        type: 'string',
-        required: true
-    })
     .option('input-mint', {
         type: 'string',
         default: 'So11111111111111111111111111111111111111112'
@@ -32,13 +28,19 @@ const argv = yargs(hideBin(process.argv))
     .argv;
 
 const connection = new Connection(argv.rpc, 'confirmed');
-console.log("private key is:::::::")
-console.log(argv["private_key"])
+
+// The base64 keypair arrives on stdin so it never shows up in the process list.
+const stdinChunks = [];
+for await (const chunk of process.stdin) {
+    stdinChunks.push(chunk);
+}
+const secret = Buffer.concat(stdinChunks);
 const wallet = new Wallet(
     Keypair.fromSecretKey(
-        Buffer.from(argv['private-key'], "base64")
+        Buffer.from(secret.toString().trim(), "base64")
     )
 );
+secret.fill(0);
 
 const quoteResponse = await (
     await fetch(
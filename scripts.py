@@ -1,4 +1,14 @@
 import subprocess
+import sys
 
 def bot():
-    subprocess.run(["python3", "apexbtbot/bot.py"])
\ No newline at end of file
+    subprocess.run(["python3", "apexbtbot/bot.py"])
+
+def migrate():
+    subprocess.run(["python3", "-m", "apexbtbot.migrate"])
+
+def export_portfolios():
+    subprocess.run(["python3", "-m", "apexbtbot.export_portfolios", *sys.argv[1:]])
+
+def retention():
+    subprocess.run(["python3", "-m", "apexbtbot.retention", *sys.argv[1:]])
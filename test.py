@@ -11,10 +11,14 @@ from apexbtbot.database import Database
 from apexbtbot.solana.functions import _buy, _sell, BuyTokenParams, SellTokenParams
 
 db = Database()
-db.init()
-user_data = db.get_user_by_telegram_id("7103256395")
-wallet = db.get_wallet_by_user_id(user_data["id"])
-private_key = Wallet.decrypt_private_key(wallet["solana_private_key"])
+
+async def load_private_key():
+    user_data = await db.get_user_by_telegram_id("7103256395")
+    wallet = await db.get_wallet_by_user_id(user_data["id"])
+    await db.close()
+    return Wallet.decrypt_private_key(wallet["solana_private_key"])
+
+private_key = asyncio.run(load_private_key())
 decoded = base64.b64decode(private_key)
 keypair = Wallet.get_keypair_from_private_key(decoded)
 client = Client("https://mainnet.helius-rpc.com/?api-key=d8965fa9-a70f-4b56-a16f-ee72dc18bd4f")